@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends
+import json
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 
 from api.schemas.chat import ChatRequest, ChatResponse
-from api.schemas.search import SearchRequest, SearchResponse
-from api.schemas.ingest import IngestRequest, IngestResponse
+from api.schemas.search import SearchBatchRequest, SearchBatchResponse, SearchRequest, SearchResponse
+from api.schemas.ingest import IngestRequest, IngestJob, IngestJobStatus
 from api.app.deps import deps
+from api.app.metrics import Metrics
+from api.app.tracing import span
 from api.rag.pipeline import ChatPipeline
+from api.stores.job_store import IngestJobStore
+from api.stores.base import VectorStore
 
 router = APIRouter()
 
@@ -16,7 +23,27 @@ def health():
 
 @router.post("/api/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest, p: ChatPipeline = Depends(deps.pipeline)):
-    return await p.chat(req)
+    with p.tracer.trace("http.chat") as tr:
+        resp = await p.chat(req)
+        with span("serialize"):
+            body = resp.model_dump_json()
+    headers = {}
+    if req.trace:
+        headers["Server-Timing"] = ", ".join(f"{name};dur={ms}" for name, ms in tr.breakdown().items())
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@router.post("/api/chat/stream")
+async def chat_stream(req: ChatRequest, p: ChatPipeline = Depends(deps.pipeline)):
+    async def events():
+        async for event, data in p.chat_stream(req):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/api/search", response_model=SearchResponse)
@@ -24,10 +51,29 @@ async def search(req: SearchRequest, p: ChatPipeline = Depends(deps.pipeline)):
     return await p.search(req)
 
 
-@router.post("/api/ingest", response_model=IngestResponse)
-async def ingest(req: IngestRequest, p: ChatPipeline = Depends(deps.pipeline)):
-    return await p.ingest(req)
+@router.post("/api/search/batch", response_model=SearchBatchResponse)
+async def search_batch(req: SearchBatchRequest, p: ChatPipeline = Depends(deps.pipeline)):
+    return await p.search_many(req)
+
+
+@router.post("/api/ingest", response_model=IngestJob, status_code=202)
+async def ingest(req: IngestRequest, jobs: IngestJobStore = Depends(deps.jobs), store: VectorStore = Depends(deps.vector_store)):
+    job = await jobs.create(req, collection=store.collection)
+    return IngestJob(job_id=job.job_id, status=job.status, collection=job.collection)
+
+
+@router.get("/api/ingest/{job_id}", response_model=IngestJobStatus)
+async def ingest_status(job_id: str, jobs: IngestJobStore = Depends(deps.jobs)):
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
 
 @router.get("/metrics")
 def metrics(p: ChatPipeline = Depends(deps.pipeline)):
-    return p.m.snapshot()
\ No newline at end of file
+    return p.m.snapshot()
+
+
+@router.get("/metrics/prometheus", response_class=PlainTextResponse)
+def metrics_prometheus(m: Metrics = Depends(deps.metrics)):
+    return PlainTextResponse(m.prometheus(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
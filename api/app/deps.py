@@ -1,12 +1,25 @@
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
 from functools import lru_cache
 
 from api.settings import settings
 from api.app.metrics import Metrics
-from api.stores.redis_store import RedisConversationStore
+from api.app.tracing import NoopExporter, OtelExporter, Tracer
+from api.stores.redis_store import AsyncRedisConversationStore
+from api.stores.base import VectorStore
 from api.stores.qdrant_store import QdrantStore
-from api.rag.embeddings import EmbeddingClient
+from api.stores.local_store import LocalVectorStore
+from api.stores.job_store import IngestJobStore
+from api.rag.embeddings import EmbeddingClient, BatchingEmbedder, Embedder
+from api.rag.llm import LLMClient
+from api.rag.semantic_cache import SemanticCache
+from api.rag.lru import LocalCache
+from api.rag.lexical import LexicalIndexStore
+from api.rag.indexer import chunk_pool
+from api.rag.rerank import CrossEncoderReranker
+from api.rag.tokens import TokenCounter
+from api.rag.summarizer import ConversationSummarizer
 from api.intent.routing import IntentRouter
 from api.rag.pipeline import ChatPipeline
 
@@ -14,33 +27,161 @@ from api.rag.pipeline import ChatPipeline
 class Deps:
     @lru_cache
     def metrics(self) -> Metrics:
-        return Metrics()
+        return Metrics(window_seconds=settings.metrics_window_seconds)
 
     @lru_cache
-    def redis(self) -> RedisConversationStore:
-        return RedisConversationStore(settings.redis_url, settings.redis_ttl_seconds, settings.chat_max_turns)
+    def tracer(self) -> Tracer:
+        exporter = OtelExporter(settings.tracing_service_name) if settings.tracing_exporter == "otel" else NoopExporter()
+        return Tracer(exporter, metrics=self.metrics())
+
+    @lru_cache
+    def redis(self) -> AsyncRedisConversationStore:
+        return AsyncRedisConversationStore(
+            settings.redis_url,
+            settings.redis_ttl_seconds,
+            settings.chat_max_turns,
+            max_connections=settings.redis_max_connections,
+        )
+
+    @lru_cache
+    def jobs(self) -> IngestJobStore:
+        return IngestJobStore(self.redis().r, settings.ingest_job_ttl_seconds)
 
     @lru_cache
     def qdrant(self) -> QdrantStore:
         return QdrantStore(settings.qdrant_url, settings.qdrant_collection)
 
     @lru_cache
-    def embedder(self) -> EmbeddingClient:
-        return EmbeddingClient(settings.embedding_provider, settings.embedding_model)
+    def vector_store(self) -> VectorStore:
+        if settings.vector_store == "local":
+            return LocalVectorStore(
+                settings.local_index_dir,
+                settings.qdrant_collection,
+                quantize=settings.local_index_quantize,
+                compact_ratio=settings.local_index_compact_ratio,
+            )
+        return self.qdrant()
+
+    @lru_cache
+    def embedder(self) -> Embedder:
+        client = EmbeddingClient(
+            settings.embedding_provider,
+            settings.embedding_model,
+            max_workers=settings.embedding_workers,
+            onnx_path=settings.embedding_onnx_path,
+            max_length=settings.embedding_max_length,
+            threads=settings.embedding_threads,
+        )
+        if settings.embedding_batch_max_size <= 1:
+            return client
+        return BatchingEmbedder(
+            client,
+            max_batch_size=settings.embedding_batch_max_size,
+            max_wait_ms=settings.embedding_batch_max_wait_ms,
+            metrics=self.metrics(),
+        )
+
+    @lru_cache
+    def llm(self) -> LLMClient:
+        return LLMClient(settings, metrics=self.metrics())
+
+    @lru_cache
+    def semantic_cache(self) -> SemanticCache | None:
+        if not settings.semantic_cache_enabled:
+            return None
+        return SemanticCache(
+            threshold=settings.semantic_cache_threshold,
+            ttl_seconds=settings.semantic_cache_ttl_seconds,
+            max_entries=settings.semantic_cache_max_entries,
+        )
+
+    @lru_cache
+    def retrieval_cache(self) -> LocalCache:
+        return LocalCache(settings.retriever_l1_max_entries, settings.retriever_l1_ttl_seconds)
+
+    @lru_cache
+    def lexical(self) -> LexicalIndexStore:
+        return LexicalIndexStore(settings.lexical_index_dir, settings.qdrant_collection)
+
+    @lru_cache
+    def ingest_pool(self) -> ProcessPoolExecutor | None:
+        return chunk_pool(settings.ingest_workers)
+
+    @lru_cache
+    def reranker(self) -> CrossEncoderReranker | None:
+        if not settings.rerank_enabled:
+            return None
+        return CrossEncoderReranker(
+            settings.rerank_model,
+            batch_size=settings.rerank_batch_size,
+            max_entries=settings.rerank_cache_max_entries,
+            ttl_seconds=settings.rerank_cache_ttl_seconds,
+            metrics=self.metrics(),
+        )
+
+    @lru_cache
+    def token_counter(self) -> TokenCounter:
+        return TokenCounter(settings.prompt_tokenizer or settings.embedding_onnx_path)
+
+    @lru_cache
+    def summarizer(self) -> ConversationSummarizer | None:
+        if not settings.summary_enabled or not settings.llm_api_key:
+            return None
+        return ConversationSummarizer(
+            self.redis(),
+            self.llm(),
+            metrics=self.metrics(),
+            trigger_messages=settings.summary_trigger_messages,
+            keep_messages=settings.summary_keep_messages,
+            queue_size=settings.summary_queue_size,
+            workers=settings.summary_workers,
+        )
 
     @lru_cache
     def intent_router(self) -> IntentRouter:
-        return IntentRouter()
+        return IntentRouter(
+            settings.intent_model_path,
+            cache_max_entries=settings.intent_cache_max_entries,
+            metrics=self.metrics(),
+            embed=lambda texts: self.embedder().embed(texts),
+            embedding_model=settings.embedding_model,
+        )
 
     def pipeline(self) -> ChatPipeline:
         return ChatPipeline(
             settings=settings,
             metrics=self.metrics(),
             conv_store=self.redis(),
-            qdrant=self.qdrant(),
+            qdrant=self.vector_store(),
             embedder=self.embedder(),
+            llm=self.llm(),
             intent_router=self.intent_router(),
+            semantic_cache=self.semantic_cache(),
+            retrieval_cache=self.retrieval_cache(),
+            lexical=self.lexical(),
+            reranker=self.reranker(),
+            token_counter=self.token_counter(),
+            summarizer=self.summarizer(),
+            tracer=self.tracer(),
+            ingest_pool=self.ingest_pool(),
         )
 
+    def startup(self) -> None:
+        self.llm()
+
+    async def shutdown(self) -> None:
+        if self.summarizer.cache_info().currsize and self.summarizer() is not None:
+            await self.summarizer().aclose()
+        if self.llm.cache_info().currsize:
+            await self.llm().aclose()
+        if self.redis.cache_info().currsize:
+            await self.redis().aclose()
+        if self.embedder.cache_info().currsize:
+            self.embedder().close()
+        if self.reranker.cache_info().currsize and self.reranker() is not None:
+            self.reranker().close()
+        if self.ingest_pool.cache_info().currsize and self.ingest_pool() is not None:
+            self.ingest_pool().shutdown(wait=False, cancel_futures=True)
+
 
 deps = Deps()
\ No newline at end of file
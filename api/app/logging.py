@@ -3,6 +3,8 @@ import sys
 import json
 from datetime import datetime
 
+from api.app.tracing import current_trace_id
+
 
 class JsonFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
@@ -12,6 +14,9 @@ class JsonFormatter(logging.Formatter):
             "logger": record.name,
             "msg": record.getMessage(),
         }
+        trace_id = current_trace_id()
+        if trace_id:
+            payload["trace_id"] = trace_id
         if hasattr(record, "extra") and isinstance(record.extra, dict):
             payload.update(record.extra)
         return json.dumps(payload, ensure_ascii=False)
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from time import perf_counter
-from typing import Dict, Any
+from time import monotonic, perf_counter
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import threading
 import math
+import re
 
 
 @dataclass
@@ -19,32 +20,221 @@ class Timer:
         return (perf_counter() - self.t0) * 1000.0
 
 
-class Metrics:
+HIST_MIN = 1e-3
+HIST_MAX = 1e7
+HIST_GAMMA = 1.04
+_LOG_GAMMA = math.log(HIST_GAMMA)
+N_BUCKETS = int(math.ceil(math.log(HIST_MAX / HIST_MIN) / _LOG_GAMMA)) + 2
+PERCENTILES = (50, 90, 95, 99)
+PROM_BOUNDS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+PROM_VALUE_BOUNDS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def bucket_of(value: float) -> int:
+    if value <= HIST_MIN:
+        return 0
+    return min(N_BUCKETS - 1, 1 + int(math.log(value / HIST_MIN) / _LOG_GAMMA))
+
+
+def bucket_upper(i: int) -> float:
+    return HIST_MIN * HIST_GAMMA ** i
+
+
+class _Hist:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.counts[bucket_of(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "_Hist") -> None:
+        counts = self.counts
+        for i, c in enumerate(list(other.counts)):
+            if c:
+                counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return math.nan
+        rank = max(1, int(math.ceil(p / 100.0 * self.count)))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                if i == 0:
+                    return min(HIST_MIN, self.max)
+                return min(math.sqrt(bucket_upper(i - 1) * bucket_upper(i)), self.max)
+        return self.max
+
+    def summary(self, suffix: str) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"count": self.count}
+        if not self.count:
+            return out
+        for p in PERCENTILES:
+            out[f"p{p}{suffix}"] = self.percentile(p)
+        out[f"max{suffix}"] = self.max
+        return out
+
+
+class _Series:
+    __slots__ = ("total", "slots", "stamps", "slot_seconds")
+
+    def __init__(self, window_slots: int, slot_seconds: float) -> None:
+        self.total = _Hist()
+        self.slots = [_Hist() for _ in range(window_slots)]
+        self.stamps = [-1] * window_slots
+        self.slot_seconds = slot_seconds
+
+    def add(self, value: float, now: float) -> None:
+        self.total.add(value)
+        if self.slots:
+            tick = int(now / self.slot_seconds)
+            i = tick % len(self.slots)
+            if self.stamps[i] != tick:
+                self.slots[i] = _Hist()
+                self.stamps[i] = tick
+            self.slots[i].add(value)
+
+    def window(self, now: float) -> Iterator[_Hist]:
+        tick = int(now / self.slot_seconds)
+        for stamp, h in zip(list(self.stamps), list(self.slots)):
+            if stamp >= 0 and tick - stamp < len(self.slots):
+                yield h
+
+
+class _Shard:
     def __init__(self) -> None:
+        self.counters: Dict[str, int] = {}
+        self.timings_ms: Dict[str, _Series] = {}
+        self.values: Dict[str, _Series] = {}
+
+
+class Metrics:
+    def __init__(self, window_seconds: Optional[float] = None, window_slots: int = 6) -> None:
         self._lock = threading.Lock()
-        self._counters: Dict[str, int] = {}
-        self._timings_ms: Dict[str, list[float]] = {}
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self.window_seconds = float(window_seconds) if window_seconds else None
+        self._window_slots = max(1, int(window_slots)) if self.window_seconds else 0
+        self._slot_seconds = self.window_seconds / self._window_slots if self.window_seconds else 1.0
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _series(self, table: Dict[str, _Series], name: str) -> _Series:
+        s = table.get(name)
+        if s is None:
+            s = table[name] = _Series(self._window_slots, self._slot_seconds)
+        return s
 
     def inc(self, name: str, value: int = 1) -> None:
-        with self._lock:
-            self._counters[name] = self._counters.get(name, 0) + value
+        counters = self._shard().counters
+        counters[name] = counters.get(name, 0) + value
 
     def observe_ms(self, name: str, value: float) -> None:
+        self._series(self._shard().timings_ms, name).add(float(value), monotonic())
+
+    def observe(self, name: str, value: float) -> None:
+        self._series(self._shard().values, name).add(float(value), monotonic())
+
+    def _merged(self) -> Tuple[Dict[str, int], Dict[str, Tuple[_Hist, Optional[_Hist]]], Dict[str, Tuple[_Hist, Optional[_Hist]]]]:
         with self._lock:
-            self._timings_ms.setdefault(name, []).append(float(value))
+            shards = list(self._shards)
+        now = monotonic()
+        counters: Dict[str, int] = {}
+        timings: Dict[str, Tuple[_Hist, Optional[_Hist]]] = {}
+        values: Dict[str, Tuple[_Hist, Optional[_Hist]]] = {}
+        for shard in shards:
+            for name, v in list(shard.counters.items()):
+                counters[name] = counters.get(name, 0) + v
+            for src, dst in ((shard.timings_ms, timings), (shard.values, values)):
+                for name, series in list(src.items()):
+                    total, window = dst.setdefault(name, (_Hist(), _Hist() if self.window_seconds else None))
+                    total.merge(series.total)
+                    if window is not None:
+                        for h in series.window(now):
+                            window.merge(h)
+        return counters, timings, values
 
     def snapshot(self) -> Dict[str, Any]:
-        with self._lock:
-            timings = {}
-            for k, xs in self._timings_ms.items():
-                if not xs:
+        counters, timings, values = self._merged()
+
+        def summarize(table: Dict[str, Tuple[_Hist, Optional[_Hist]]], suffix: str) -> Dict[str, Any]:
+            out = {}
+            for name, (total, window) in table.items():
+                if not total.count:
                     continue
-                ys = sorted(xs)
-                def pct(p: float) -> float:
-                    if not ys:
-                        return math.nan
-                    i = int(round((p / 100.0) * (len(ys) - 1)))
-                    i = max(0, min(len(ys) - 1, i))
-                    return ys[i]
-                timings[k] = {"count": len(ys), "p50_ms": pct(50), "p95_ms": pct(95)}
-            return {"counters": dict(self._counters), "timings_ms": timings}
\ No newline at end of file
+                out[name] = total.summary(suffix)
+                if window is not None:
+                    out[name]["window"] = {"seconds": self.window_seconds, **window.summary(suffix)}
+            return out
+
+        ratios = {}
+        for name, hits in counters.items():
+            if name.endswith("_hit"):
+                base = name[: -len("_hit")]
+                total = hits + counters.get(f"{base}_miss", 0)
+                ratios[f"{base}_hit_ratio"] = hits / total if total else 0.0
+        return {
+            "counters": counters,
+            "timings_ms": summarize(timings, "_ms"),
+            "values": summarize(values, ""),
+            "ratios": ratios,
+        }
+
+    def prometheus(self, prefix: str = "rag") -> str:
+        counters, timings, values = self._merged()
+        lines: List[str] = []
+        for name, v in sorted(counters.items()):
+            metric = _prom_name(f"{prefix}_{_strip(name, '_total')}_total")
+            lines += [f"# TYPE {metric} counter", f"{metric} {v}"]
+        for table, unit, table_bounds in ((timings, "_milliseconds", PROM_BOUNDS), (values, "", PROM_VALUE_BOUNDS)):
+            for name, (total, _) in sorted(table.items()):
+                base = _strip(_strip(name, "_ms"), "_total") if unit else name
+                metric = _prom_name(f"{prefix}_{base}{unit}")
+                lines.append(f"# TYPE {metric} histogram")
+                bounds = iter(table_bounds)
+                le = next(bounds, None)
+                seen = 0
+                for i, c in enumerate(total.counts):
+                    while le is not None and bucket_upper(i) > le:
+                        lines.append(f'{metric}_bucket{{le="{le}"}} {seen}')
+                        le = next(bounds, None)
+                    seen += c
+                while le is not None:
+                    lines.append(f'{metric}_bucket{{le="{le}"}} {seen}')
+                    le = next(bounds, None)
+                lines += [
+                    f'{metric}_bucket{{le="+Inf"}} {total.count}',
+                    f"{metric}_sum {total.total}",
+                    f"{metric}_count {total.count}",
+                ]
+        return "\n".join(lines) + "\n"
+
+
+_PROM_RE = re.compile(r"[^a-zA-Z0-9_:]")
+
+
+def _prom_name(name: str) -> str:
+    return _PROM_RE.sub("_", name)
+
+
+def _strip(name: str, suffix: str) -> str:
+    return name[: -len(suffix)] if name.endswith(suffix) and len(name) > len(suffix) else name
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional
+
+from api.app.metrics import Metrics
+
+log = logging.getLogger("api")
+
+
+@dataclass
+class SpanRecord:
+    name: str
+    span_id: int
+    parent_id: Optional[int]
+    start_ns: int
+    duration_ms: float
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+class Trace:
+    def __init__(self, tracer: "Tracer", name: str) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[SpanRecord] = []
+        self._ids = itertools.count(1)
+        self.root: Optional[SpanRecord] = None
+        self._t0 = perf_counter()
+
+    def record(self, name: str, start_ns: int, duration_ms: float, **attrs: Any) -> SpanRecord:
+        parent = self.root.span_id if self.root is not None else None
+        rec = SpanRecord(name=name, span_id=next(self._ids), parent_id=parent, start_ns=start_ns, duration_ms=duration_ms, attrs=attrs)
+        self.spans.append(rec)
+        return rec
+
+    def breakdown(self) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        for s in self.spans:
+            out[s.name] = round(out.get(s.name, 0.0) + s.duration_ms, 3)
+        return out
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_parent: ContextVar[Optional[int]] = ContextVar("trace_parent", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def current_trace_id() -> Optional[str]:
+    tr = _trace.get()
+    return tr.trace_id if tr is not None else None
+
+
+@contextmanager
+def span(name: str, timed: bool = True, **attrs: Any) -> Iterator[Optional[SpanRecord]]:
+    tr = _trace.get()
+    if tr is None:
+        yield None
+        return
+    rec = SpanRecord(name=name, span_id=next(tr._ids), parent_id=_parent.get(), start_ns=time.time_ns(), duration_ms=0.0, attrs=attrs)
+    token = _parent.set(rec.span_id)
+    t0 = perf_counter()
+    try:
+        yield rec
+    finally:
+        rec.duration_ms = (perf_counter() - t0) * 1000.0
+        _parent.reset(token)
+        tr.spans.append(rec)
+        if timed and tr.tracer.metrics is not None:
+            tr.tracer.metrics.observe_ms(f"span_{name}_ms", rec.duration_ms)
+
+
+class NoopExporter:
+    def export(self, trace: Trace) -> None:
+        return None
+
+
+class OtelExporter:
+    def __init__(self, service_name: str) -> None:
+        from opentelemetry import trace as otel
+
+        if not hasattr(otel.get_tracer_provider(), "add_span_processor"):
+            try:
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+                from opentelemetry.sdk.resources import Resource
+                from opentelemetry.sdk.trace import TracerProvider
+                from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+                provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+                provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+                otel.set_tracer_provider(provider)
+            except ImportError:
+                log.warning("otel_sdk_missing", extra={"extra": {"service": service_name}})
+        self._otel = otel
+        self._tracer = otel.get_tracer("rag-assistant")
+
+    def export(self, trace: Trace) -> None:
+        started: Dict[int, Any] = {}
+        spans = sorted(trace.spans, key=lambda s: s.start_ns)
+        for s in spans:
+            parent = started.get(s.parent_id) if s.parent_id is not None else None
+            ctx = self._otel.set_span_in_context(parent) if parent is not None else None
+            attrs = {k: v for k, v in s.attrs.items() if isinstance(v, (str, bool, int, float))}
+            attrs["rag.trace_id"] = trace.trace_id
+            started[s.span_id] = self._tracer.start_span(s.name, context=ctx, start_time=s.start_ns, attributes=attrs)
+        for s in reversed(spans):
+            started[s.span_id].end(end_time=s.start_ns + int(s.duration_ms * 1e6))
+
+
+class Tracer:
+    def __init__(self, exporter: Optional[Any] = None, metrics: Optional[Metrics] = None) -> None:
+        self.exporter = exporter or NoopExporter()
+        self.metrics = metrics
+
+    def start(self, name: str, **attrs: Any) -> Trace:
+        tr = Trace(self, name)
+        tr.root = SpanRecord(name=name, span_id=next(tr._ids), parent_id=None, start_ns=time.time_ns(), duration_ms=0.0, attrs=attrs)
+        return tr
+
+    @contextmanager
+    def activate(self, tr: Trace) -> Iterator[Trace]:
+        token = _trace.set(tr)
+        parent = _parent.set(tr.root.span_id if tr.root is not None else None)
+        try:
+            yield tr
+        finally:
+            _parent.reset(parent)
+            _trace.reset(token)
+
+    def finish(self, tr: Trace) -> None:
+        if tr.root is not None:
+            tr.root.duration_ms = (perf_counter() - tr._t0) * 1000.0
+            tr.spans.append(tr.root)
+        try:
+            self.exporter.export(tr)
+        except Exception as e:
+            log.warning("trace_export_failed", extra={"extra": {"trace_id": tr.trace_id, "error": str(e)}})
+
+    @contextmanager
+    def trace(self, name: str, **attrs: Any) -> Iterator[Trace]:
+        tr = _trace.get()
+        if tr is not None:
+            with span(name, timed=False, **attrs):
+                yield tr
+            return
+        tr = self.start(name, **attrs)
+        try:
+            with self.activate(tr):
+                yield tr
+        finally:
+            self.finish(tr)
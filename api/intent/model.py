@@ -1,20 +1,166 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import List
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+import re
+
 import joblib
+import numpy as np
+
+
+class LinearTextScorer:
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        idf: np.ndarray,
+        coef: np.ndarray,
+        intercept: np.ndarray,
+        classes: List[str],
+        token_pattern: str,
+        ngram_range: tuple,
+        lowercase: bool = True,
+    ) -> None:
+        self.vocab = vocab
+        self.idf = idf.astype(np.float32)
+        self.coef_t = np.ascontiguousarray(coef.T, dtype=np.float32)
+        self.intercept = intercept.astype(np.float32)
+        self.classes = list(classes)
+        self.token_re = re.compile(token_pattern)
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.lowercase = lowercase
+
+    @classmethod
+    def from_pipeline(cls, pipeline: object) -> Optional["LinearTextScorer"]:
+        steps = getattr(pipeline, "named_steps", {})
+        vec, clf = steps.get("tfidf"), steps.get("clf")
+        if vec is None or clf is None or not hasattr(clf, "coef_"):
+            return None
+        simple = (
+            vec.analyzer == "word"
+            and vec.tokenizer is None
+            and vec.preprocessor is None
+            and vec.strip_accents is None
+            and vec.stop_words is None
+            and vec.norm == "l2"
+            and vec.use_idf
+            and not vec.sublinear_tf
+        )
+        if not simple:
+            return None
+        return cls(
+            vocab={t: int(i) for t, i in vec.vocabulary_.items()},
+            idf=vec.idf_,
+            coef=clf.coef_,
+            intercept=clf.intercept_,
+            classes=[str(c) for c in clf.classes_],
+            token_pattern=vec.token_pattern,
+            ngram_range=vec.ngram_range,
+            lowercase=vec.lowercase,
+        )
+
+    def _terms(self, text: str) -> List[str]:
+        tokens = self.token_re.findall(text.lower() if self.lowercase else text)
+        lo, hi = self.ngram_range
+        if hi == 1:
+            return tokens
+        out = list(tokens) if lo == 1 else []
+        for n in range(max(2, lo), hi + 1):
+            out.extend(" ".join(tokens[i : i + n]) for i in range(len(tokens) - n + 1))
+        return out
+
+    def scores(self, text: str) -> np.ndarray:
+        counts = Counter(i for i in map(self.vocab.get, self._terms(text)) if i is not None)
+        if not counts:
+            return self.intercept.copy()
+        idx = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        w = np.fromiter(counts.values(), dtype=np.float32, count=len(counts)) * self.idf[idx]
+        w /= np.linalg.norm(w)
+        return self.intercept + w @ self.coef_t[idx]
+
+    def predict_one(self, text: str) -> str:
+        s = self.scores(text)
+        if len(self.classes) == 2:
+            return self.classes[int(s[0] > 0)]
+        return self.classes[int(np.argmax(s))]
+
+    def predict(self, texts: List[str]) -> List[str]:
+        return [self.predict_one(t) for t in texts]
 
 
 @dataclass
 class IntentModel:
     pipeline: object
+    scorer: Optional[LinearTextScorer] = field(default=None, repr=False)
+    needs_vector = False
+
+    def __post_init__(self) -> None:
+        if self.scorer is None:
+            self.scorer = LinearTextScorer.from_pipeline(self.pipeline)
 
     def predict(self, texts: List[str]) -> List[str]:
+        if self.scorer is not None:
+            return self.scorer.predict(texts)
         return self.pipeline.predict(texts).tolist()
 
+    def route_many(self, texts: List[str]) -> List[str]:
+        if not texts:
+            return []
+        return self.predict(texts)
+
     def save(self, path: str) -> None:
         joblib.dump(self.pipeline, path)
 
     @staticmethod
     def load(path: str) -> "IntentModel":
-        return IntentModel(joblib.load(path))
\ No newline at end of file
+        return IntentModel(joblib.load(path))
+
+
+@dataclass
+class EmbeddingIntentModel:
+    classes: List[str]
+    weights: np.ndarray
+    bias: np.ndarray
+    embedding_model: str
+    head: str = "centroid"
+    needs_vector = True
+
+    def __post_init__(self) -> None:
+        self.weights = np.ascontiguousarray(self.weights, dtype=np.float32)
+        self.bias = np.asarray(self.bias, dtype=np.float32)
+
+    def scores(self, vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32) @ self.weights.T + self.bias
+
+    def predict_vectors(self, vectors: Sequence[Sequence[float]]) -> List[str]:
+        s = self.scores(vectors)
+        if s.shape[1] == 1:
+            return [self.classes[int(x > 0)] for x in s[:, 0]]
+        return [self.classes[i] for i in np.argmax(s, axis=1)]
+
+    def save(self, path: str) -> None:
+        np.savez(
+            path,
+            classes=np.array(self.classes),
+            weights=self.weights,
+            bias=self.bias,
+            embedding_model=np.array(self.embedding_model),
+            head=np.array(self.head),
+        )
+
+    @staticmethod
+    def load(path: str) -> "EmbeddingIntentModel":
+        with np.load(path, allow_pickle=False) as z:
+            return EmbeddingIntentModel(
+                classes=[str(c) for c in z["classes"]],
+                weights=z["weights"],
+                bias=z["bias"],
+                embedding_model=str(z["embedding_model"]),
+                head=str(z["head"]),
+            )
+
+
+def load_intent_model(path: str):
+    if path.endswith(".npz"):
+        return EmbeddingIntentModel.load(path)
+    return IntentModel.load(path)
@@ -2,31 +2,118 @@ from __future__ import annotations
 
 import re
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
 
-from api.intent.model import IntentModel
+from api.app.metrics import Metrics
+from api.intent.model import load_intent_model
+from api.rag.lru import LocalCache
 
 
 PHONE_RE = re.compile(r"(\+?\d[\d\-\s\(\)]{8,}\d)")
 EMAIL_RE = re.compile(r"([a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+)")
+CTA_KEYWORDS = ("коммерческ", "кп", "счет", "счёт", "прайс", "связ", "контакт", "менеджер")
+OPERATOR_KEYWORDS = ("оператор", "человек", "позвоните", "соедините")
+
+KEYWORDS_RE = re.compile(
+    "(?P<cta>"
+    + "|".join(re.escape(k) for k in CTA_KEYWORDS)
+    + ")|(?P<op>"
+    + "|".join(re.escape(k) for k in OPERATOR_KEYWORDS)
+    + ")"
+)
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def match_rules(low: str) -> Optional[str]:
+    if ("@" in low and EMAIL_RE.search(low)) or PHONE_RE.search(low):
+        return "CTA"
+    label = None
+    for m in KEYWORDS_RE.finditer(low):
+        if m.lastgroup == "cta":
+            return "CTA"
+        label = "OPERATOR"
+    return label
 
 
 class IntentRouter:
-    def __init__(self, model_path: str = "reports/intent_model.joblib") -> None:
+    def __init__(
+        self,
+        model_path: str = "reports/intent_model.joblib",
+        cache_max_entries: int = 4096,
+        metrics: Optional[Metrics] = None,
+        embed: Optional[Callable[[List[str]], Sequence[Sequence[float]]]] = None,
+        embedding_model: Optional[str] = None,
+    ) -> None:
         self.model_path = model_path
-        self.model = IntentModel.load(model_path) if Path(model_path).exists() else None
+        self.model = load_intent_model(model_path) if Path(model_path).exists() else None
+        trained_on = getattr(self.model, "embedding_model", None)
+        if trained_on and embedding_model and trained_on != embedding_model:
+            raise ValueError(f"intent model {model_path} was trained on {trained_on}, not {embedding_model}")
+        self.cache = LocalCache(cache_max_entries, float("inf"))
+        self.metrics = metrics
+        self.embed = embed
 
-    def route(self, text: str) -> str:
-        t = text.strip()
-        if PHONE_RE.search(t) or EMAIL_RE.search(t):
-            return "CTA"
-        low = t.lower()
-        if any(x in low for x in ["коммерческ", "кп", "счет", "счёт", "прайс", "связ", "контакт", "менеджер"]):
-            return "CTA"
-        if any(x in low for x in ["оператор", "человек", "позвоните", "соедините"]):
-            return "OPERATOR"
-        if self.model:
-            try:
-                return self.model.predict([t])[0]
-            except Exception:
-                return "RAG"
-        return "RAG"
\ No newline at end of file
+    @property
+    def needs_vector(self) -> bool:
+        return self.model is not None and self.model.needs_vector
+
+    def _lookup(self, key: str) -> Optional[str]:
+        label = self.cache.get(key)
+        if self.metrics is not None:
+            self.metrics.inc("intent_cache_hit" if label is not None else "intent_cache_miss")
+        if label is None:
+            label = match_rules(key)
+            if label is not None:
+                self.cache.put(key, label)
+        return label
+
+    def _predict(self, texts: List[str], vectors: Optional[Sequence[Sequence[float]]]) -> List[str]:
+        if self.model is None:
+            return ["RAG"] * len(texts)
+        try:
+            if not self.model.needs_vector:
+                return self.model.route_many(texts)
+            if vectors is None:
+                if self.embed is None:
+                    return ["RAG"] * len(texts)
+                vectors = self.embed(texts)
+            return self.model.predict_vectors(vectors)
+        except Exception:
+            return ["RAG"] * len(texts)
+
+    def resolve(self, text: str) -> Optional[str]:
+        return self._lookup(normalize(text))
+
+    def classify(self, text: str, vector: Optional[Sequence[float]] = None) -> str:
+        label = self._predict([text], [vector] if vector is not None else None)[0]
+        self.cache.put(normalize(text), label)
+        return label
+
+    def route(self, text: str, vector: Optional[Sequence[float]] = None) -> str:
+        return self.route_many([text], [vector] if vector is not None else None)[0]
+
+    def route_many(self, texts: List[str], vectors: Optional[Sequence[Sequence[float]]] = None) -> List[str]:
+        out: List[Optional[str]] = [None] * len(texts)
+        pending: Dict[str, List[int]] = {}
+        for i, t in enumerate(texts):
+            key = normalize(t)
+            label = self._lookup(key)
+            if label is not None:
+                out[i] = label
+            else:
+                pending.setdefault(key, []).append(i)
+        if pending:
+            todo = list(pending)
+            first = [pending[k][0] for k in todo]
+            labels = self._predict(
+                [texts[i] for i in first],
+                [vectors[i] for i in first] if vectors is not None else None,
+            )
+            for key, label in zip(todo, labels):
+                self.cache.put(key, label)
+                for i in pending[key]:
+                    out[i] = label
+        return out  # type: ignore[return-value]
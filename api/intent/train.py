@@ -2,13 +2,14 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import Tuple, List
+from typing import Callable, List, Sequence, Tuple
 
+import numpy as np
 from sklearn.pipeline import Pipeline
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 
-from api.intent.model import IntentModel
+from api.intent.model import EmbeddingIntentModel, IntentModel
 
 
 def load_jsonl(path: str) -> Tuple[List[str], List[str]]:
@@ -31,4 +32,25 @@ def train(train_path: str) -> IntentModel:
         ]
     )
     pipe.fit(x_train, y_train)
-    return IntentModel(pipe)
\ No newline at end of file
+    return IntentModel(pipe)
+
+
+def train_embedding(
+    train_path: str,
+    embed: Callable[[List[str]], Sequence[Sequence[float]]],
+    embedding_model: str,
+    head: str = "centroid",
+) -> EmbeddingIntentModel:
+    x_train, y_train = load_jsonl(train_path)
+    x = np.asarray(embed(x_train), dtype=np.float32)
+    x /= np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+    y = np.asarray(y_train)
+    if head == "linear":
+        clf = LogisticRegression(max_iter=2000).fit(x, y)
+        return EmbeddingIntentModel([str(c) for c in clf.classes_], clf.coef_, clf.intercept_, embedding_model, head)
+    if head != "centroid":
+        raise ValueError(f"unknown intent head: {head}")
+    classes = sorted(set(y_train))
+    centroids = np.stack([x[y == c].mean(axis=0) for c in classes])
+    centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return EmbeddingIntentModel(classes, centroids, np.zeros(len(classes), dtype=np.float32), embedding_model, head)
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from pathlib import Path
-from typing import List, Iterable, Dict
+import hashlib
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import List, Iterable, Dict, Optional
 
 
 @dataclass
@@ -42,13 +44,70 @@ def chunk_markdown(text: str, max_chars: int = 900) -> List[str]:
     return [p for p in parts if len(p) > 40]
 
 
+def doc_key(fp: Path, root: Path) -> str:
+    return fp.relative_to(root).as_posix()
+
+
+def chunk_file(fp: Path, key: Optional[str] = None) -> List[DocChunk]:
+    raw = fp.read_text(encoding="utf-8")
+    title = fp.stem.replace("_", " ").strip()
+    stem = PurePosixPath(key or fp.name).with_suffix("").as_posix()
+    pieces = chunk_markdown(raw)
+    return [
+        DocChunk(doc_id=f"{stem}:{i}", title=title, source_path=str(fp), text=piece)
+        for i, piece in enumerate(pieces)
+    ]
+
+
 def build_chunks(docs_root: str, limit: int | None = None) -> List[DocChunk]:
+    root = Path(docs_root)
     chunks: List[DocChunk] = []
     for fp in read_markdown_files(docs_root, limit=limit):
-        raw = fp.read_text(encoding="utf-8")
-        title = fp.stem.replace("_", " ").strip()
-        pieces = chunk_markdown(raw)
-        for i, piece in enumerate(pieces):
-            doc_id = f"{fp.stem}:{i}"
-            chunks.append(DocChunk(doc_id=doc_id, title=title, source_path=str(fp), text=piece))
-    return chunks
\ No newline at end of file
+        chunks.extend(chunk_file(fp, doc_key(fp, root)))
+    return chunks
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def point_id(doc_id: str, text: str) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{doc_id}:{content_hash(text)}"))
+
+
+@dataclass
+class FileScan:
+    path: str
+    key: str
+    mtime_ns: int
+    size: int
+    sha256: Optional[str] = None
+    chunks: Optional[List[DocChunk]] = None
+    points: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def scan_file(path: str, key: str, prev: Optional[dict]) -> FileScan:
+    try:
+        return _scan_file(path, key, prev)
+    except (OSError, UnicodeDecodeError) as e:
+        return FileScan(path=path, key=key, mtime_ns=0, size=0, error=f"{type(e).__name__}: {e}")
+
+
+def _scan_file(path: str, key: str, prev: Optional[dict]) -> FileScan:
+    fp = Path(path)
+    st = fp.stat()
+    out = FileScan(path=path, key=key, mtime_ns=st.st_mtime_ns, size=st.st_size)
+    if prev and prev.get("mtime_ns") == st.st_mtime_ns and prev.get("size") == st.st_size:
+        return out
+    raw = fp.read_bytes()
+    out.sha256 = hashlib.sha256(raw).hexdigest()
+    if prev and prev.get("sha256") == out.sha256:
+        return out
+    out.chunks = chunk_file(fp, key)
+    out.points = {c.doc_id: point_id(c.doc_id, c.text) for c in out.chunks}
+    return out
+
+
+def scan_many(items: List[tuple]) -> List[FileScan]:
+    return [scan_file(path, key, prev) for path, key, prev in items]
@@ -1,18 +1,141 @@
 from __future__ import annotations
 
-from typing import List
-from sentence_transformers import SentenceTransformer
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from api.app.metrics import Metrics
 
 
 class EmbeddingClient:
-    def __init__(self, provider: str, model: str) -> None:
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        max_workers: int = 1,
+        onnx_path: Optional[str] = None,
+        max_length: int = 256,
+        threads: int = 0,
+    ) -> None:
         self.provider = provider
         self.model_name = model
-        self._model = SentenceTransformer(model)
+        if provider == "onnx":
+            from api.rag.onnx_encoder import OnnxEncoder
+
+            self._model = OnnxEncoder(onnx_path or model, max_length=max_length, threads=threads)
+        elif provider == "sentence_transformers":
+            from sentence_transformers import SentenceTransformer
+
+            self._model = SentenceTransformer(model)
+        else:
+            raise ValueError(f"unknown embedding provider: {provider}")
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="embed")
 
     def dim(self) -> int:
         return int(self._model.get_sentence_embedding_dimension())
 
-    def embed(self, texts: List[str]) -> List[List[float]]:
+    def embed(self, texts: List[str]) -> np.ndarray:
         xs = self._model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
-        return [x.tolist() for x in xs]
\ No newline at end of file
+        return np.asarray(xs, dtype=np.float32)
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed, texts)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class BatchingEmbedder:
+    def __init__(
+        self,
+        client: EmbeddingClient,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.client = client
+        self.provider = client.provider
+        self.model_name = client.model_name
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self.m = metrics
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue[Tuple[str, asyncio.Future, float]]] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def dim(self) -> int:
+        return self.client.dim()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.client.embed(texts)
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        if len(texts) >= self.max_batch_size or not texts:
+            return await self.client.aembed(texts)
+        queue = self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        futs = []
+        for t in texts:
+            fut = loop.create_future()
+            queue.put_nowait((t, fut, perf_counter()))
+            futs.append(fut)
+        return np.stack(await asyncio.gather(*futs))
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            while len(batch) < self.max_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        live = [x for x in batch if not x[1].done()]
+        if not live:
+            return
+        t0 = perf_counter()
+        if self.m:
+            self.m.observe("embed_batch_size", len(live))
+            for _, _, enq in live:
+                self.m.observe_ms("embed_queue_wait_ms", (t0 - enq) * 1000.0)
+        try:
+            vectors = await self.client.aembed([t for t, _, _ in live])
+        except Exception as e:
+            for _, fut, _ in live:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        if self.m:
+            self.m.observe_ms("embed_batch_ms", (perf_counter() - t0) * 1000.0)
+        for (_, fut, _), v in zip(live, vectors):
+            if not fut.done():
+                fut.set_result(v)
+
+    def close(self) -> None:
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+        self.client.close()
+
+
+Embedder = Union[EmbeddingClient, BatchingEmbedder]
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 from api.rag.retriever import RetrievedChunk
 
 
@@ -11,10 +11,22 @@ class GateDecision:
     reason: str
 
 
-def decide(chunks: List[RetrievedChunk], min_score: float) -> GateDecision:
+def decide(
+    chunks: List[RetrievedChunk],
+    min_score: float,
+    min_lexical_score: Optional[float] = None,
+    min_rerank_score: Optional[float] = None,
+) -> GateDecision:
     if not chunks:
         return GateDecision(ok=False, reason="empty")
-    best = max(c.score for c in chunks)
-    if best < float(min_score):
+    reranked = [c.rerank_score for c in chunks if c.rerank_score is not None]
+    if min_rerank_score is not None and reranked:
+        if max(reranked) >= float(min_rerank_score):
+            return GateDecision(ok=True, reason="rerank")
         return GateDecision(ok=False, reason="low_score")
-    return GateDecision(ok=True, reason="ok")
\ No newline at end of file
+    best = max(c.score for c in chunks)
+    if best >= float(min_score):
+        return GateDecision(ok=True, reason="ok")
+    if min_lexical_score is not None and max(c.lexical_score for c in chunks) >= float(min_lexical_score):
+        return GateDecision(ok=True, reason="lexical")
+    return GateDecision(ok=False, reason="low_score")
\ No newline at end of file
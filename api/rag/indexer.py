@@ -0,0 +1,372 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from api.app.metrics import Metrics
+from api.rag.chunking import DocChunk, FileScan, content_hash, doc_key, read_markdown_files, scan_file, scan_many
+from api.rag.embeddings import Embedder
+from api.rag.lexical import LexicalIndexStore
+from api.schemas.ingest import IngestRequest, IngestResponse
+from api.stores.base import VectorPoint, VectorStore
+from api.stores.redis_store import AsyncRedisConversationStore
+
+
+log = logging.getLogger("api")
+
+
+class IngestValidationError(RuntimeError):
+    pass
+
+
+@dataclass
+class IngestStats:
+    deletes: List[str] = field(default_factory=list)
+    manifest_set: Dict[str, str] = field(default_factory=dict)
+    manifest_del: List[str] = field(default_factory=list)
+    files: int = 0
+    files_total: int = 0
+    chunks: int = 0
+    errors: List[str] = field(default_factory=list)
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+    skipped: int = 0
+    total: int = 0
+    embedded: int = 0
+    upserted: int = 0
+    samples: List[Tuple[str, Sequence[float]]] = field(default_factory=list)
+    point_ids: Set[str] = field(default_factory=set)
+
+    def changed(self) -> bool:
+        return bool(self.upserted or self.deletes)
+
+
+def scan_files(
+    files: Iterable[Tuple[str, str]],
+    manifest: Dict[str, dict],
+    executor: Optional[Executor] = None,
+    window: int = 16,
+    files_per_task: int = 16,
+) -> Iterator[FileScan]:
+    if executor is None:
+        for path, key in files:
+            yield scan_file(path, key, manifest.get(key))
+        return
+    inflight: deque = deque()
+    it = iter(files)
+    while True:
+        batch = [(path, key, manifest.get(key)) for path, key in islice(it, files_per_task)]
+        if batch:
+            inflight.append(executor.submit(scan_many, batch))
+        if inflight and (len(inflight) >= window or not batch):
+            yield from inflight.popleft().result()
+        if not batch and not inflight:
+            return
+
+
+def iter_changes(
+    docs_path: str,
+    limit: int | None,
+    manifest: Dict[str, dict],
+    stats: IngestStats,
+    executor: Optional[Executor] = None,
+    window: int = 16,
+    parallel_min_files: int = 0,
+    parallel_min_bytes: int = 0,
+) -> Iterator[Tuple[str, DocChunk]]:
+    seen = set()
+    root = Path(docs_path)
+    files = [(str(fp), doc_key(fp, root)) for fp in read_markdown_files(docs_path, limit=limit)]
+    stats.files_total = len(files)
+    if executor is not None and not worth_parallel([path for path, _ in files], parallel_min_files, parallel_min_bytes):
+        executor = None
+    for scan in scan_files(files, manifest, executor=executor, window=window):
+        key = scan.key
+        seen.add(key)
+        stats.files += 1
+        if scan.error is not None:
+            stats.errors.append(f"{scan.path}: {scan.error}")
+            continue
+        prev = manifest.get(key)
+        old_points: Dict[str, str] = (prev or {}).get("points", {})
+        if scan.chunks is None:
+            stats.skipped += len(old_points)
+            stats.total += len(old_points)
+            stats.point_ids.update(old_points.values())
+            if scan.sha256 is not None:
+                stats.manifest_set[key] = json.dumps({**prev, "mtime_ns": scan.mtime_ns, "size": scan.size})
+            continue
+
+        stats.chunks += len(scan.chunks)
+        for c in scan.chunks:
+            pid = scan.points[c.doc_id]
+            if old_points.get(c.doc_id) == pid:
+                stats.skipped += 1
+                continue
+            if c.doc_id in old_points:
+                stats.updated += 1
+            else:
+                stats.added += 1
+            yield pid, c
+        kept = set(scan.points.values())
+        stats.deletes.extend(pid for pid in old_points.values() if pid not in kept)
+        stats.deleted += sum(1 for doc_id in old_points if doc_id not in scan.points)
+        stats.total += len(scan.points)
+        stats.point_ids.update(scan.points.values())
+        stats.manifest_set[key] = json.dumps(
+            {"mtime_ns": scan.mtime_ns, "size": scan.size, "sha256": scan.sha256, "points": scan.points}
+        )
+
+    if not limit:
+        for key, prev in manifest.items():
+            if key in seen:
+                continue
+            pids = [pid for pid in prev.get("points", {}).values() if pid not in stats.point_ids]
+            stats.deletes.extend(pids)
+            stats.deleted += len(pids)
+            stats.manifest_del.append(key)
+
+
+def worth_parallel(paths: List[str], min_files: int, min_bytes: int) -> bool:
+    if len(paths) >= min_files:
+        return True
+    total = 0
+    for path in paths:
+        try:
+            total += os.stat(path).st_size
+        except OSError:
+            continue
+        if total >= min_bytes:
+            return True
+    return False
+
+
+def _take(it: Iterator, n: int) -> list:
+    return list(islice(it, n))
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def chunk_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    if int(workers) <= 1:
+        return None
+    return ProcessPoolExecutor(max_workers=int(workers), mp_context=multiprocessing.get_context("spawn"))
+
+
+class Indexer:
+    def __init__(
+        self,
+        qdrant: VectorStore,
+        embedder: Embedder,
+        store: AsyncRedisConversationStore,
+        metrics: Metrics,
+        embed_batch_size: int = 64,
+        upsert_batch_size: int = 256,
+        workers: int = 1,
+        keep_versions: int = 2,
+        validate_samples: int = 3,
+        lexical: Optional[LexicalIndexStore] = None,
+        pool: Optional[Executor] = None,
+        parallel_min_files: int = 256,
+        parallel_min_bytes: int = 4 * 1024 * 1024,
+    ) -> None:
+        self.qdrant = qdrant
+        self.embedder = embedder
+        self.store = store
+        self.m = metrics
+        self.embed_batch_size = max(1, int(embed_batch_size))
+        self.upsert_batch_size = max(1, int(upsert_batch_size))
+        self.workers = int(workers)
+        self.keep_versions = int(keep_versions)
+        self.validate_samples = int(validate_samples)
+        self.lexical = lexical
+        self.pool = pool
+        self.parallel_min_files = int(parallel_min_files)
+        self.parallel_min_bytes = int(parallel_min_bytes)
+
+    def _manifest_key(self) -> str:
+        return f"ingest:{self.qdrant.collection}:manifest"
+
+    async def load_manifest(self) -> Dict[str, dict]:
+        raw = await self.store.r.hgetall(self._manifest_key())
+        out = {}
+        for path, v in (raw or {}).items():
+            try:
+                out[path] = json.loads(v)
+            except Exception:
+                continue
+        return out
+
+    async def run(
+        self,
+        req: IngestRequest,
+        progress: Optional[Callable[[IngestStats], None]] = None,
+    ) -> Tuple[IngestResponse, bool]:
+        t0 = perf_counter()
+        live = await asyncio.to_thread(self.qdrant.current)
+        rebuild = req.recreate or live is None
+        if rebuild:
+            target = await asyncio.to_thread(self.qdrant.create_version, self.embedder.dim())
+            manifest: Dict[str, dict] = {}
+        else:
+            target = live
+            manifest = await self.load_manifest()
+
+        try:
+            stats = await self._build(req, target, manifest, progress)
+            await asyncio.to_thread(self.qdrant.flush, target)
+            if rebuild:
+                await self._validate(target, stats)
+        except BaseException:
+            if rebuild:
+                await asyncio.to_thread(self.qdrant.drop, target)
+            raise
+
+        key = self._manifest_key()
+        if rebuild:
+            await asyncio.to_thread(self.qdrant.swap, target)
+            dropped = await asyncio.to_thread(self.qdrant.drop_old_versions, self.keep_versions)
+            log.info("ingest_swapped", extra={"extra": {"alias": self.qdrant.collection, "target": target, "dropped": dropped}})
+            await self.store.r.delete(key)
+        else:
+            if stats.deletes:
+                await asyncio.to_thread(self.qdrant.delete, stats.deletes, target)
+                await asyncio.to_thread(self.qdrant.flush, target)
+            if stats.manifest_del:
+                await self.store.r.hdel(key, *stats.manifest_del)
+        if stats.manifest_set:
+            await self.store.r.hset(key, mapping=stats.manifest_set)
+
+        changed = rebuild or stats.changed()
+        if self.lexical is not None and (changed or self.lexical.current() is None):
+            l0 = perf_counter()
+            await asyncio.to_thread(self.lexical.publish, self.qdrant.scroll(target), target)
+            self.m.observe_ms("ingest_lexical_ms", (perf_counter() - l0) * 1000.0)
+
+        elapsed_ms = (perf_counter() - t0) * 1000.0
+        rate = stats.embedded / (elapsed_ms / 1000.0) if elapsed_ms > 0 else 0.0
+        self.m.inc("ingest_added", stats.added)
+        self.m.inc("ingest_updated", stats.updated)
+        self.m.inc("ingest_deleted", stats.deleted)
+        self.m.inc("ingest_skipped", stats.skipped)
+        self.m.observe_ms("ingest_total_ms", elapsed_ms)
+        self.m.observe("ingest_chunks_per_sec", rate)
+        self.m.observe("ingest_peak_rss_mb", peak_rss_mb())
+        resp = IngestResponse(
+            indexed_chunks=stats.total,
+            collection=target,
+            added=stats.added,
+            updated=stats.updated,
+            deleted=stats.deleted,
+            skipped=stats.skipped,
+            errors=len(stats.errors),
+            elapsed_ms=elapsed_ms,
+            chunks_per_sec=rate,
+        )
+        return resp, changed
+
+    async def _build(
+        self,
+        req: IngestRequest,
+        target: str,
+        manifest: Dict[str, dict],
+        progress: Optional[Callable[[IngestStats], None]],
+    ) -> IngestStats:
+        stats = IngestStats()
+        changes = iter_changes(
+            req.docs_path,
+            req.limit,
+            manifest,
+            stats,
+            executor=self.pool,
+            window=max(1, self.workers) * 2,
+            parallel_min_files=self.parallel_min_files,
+            parallel_min_bytes=self.parallel_min_bytes,
+        )
+        buffer: List[VectorPoint] = []
+        pending: Optional[asyncio.Task] = None
+        try:
+            while True:
+                batch = await asyncio.to_thread(_take, changes, self.embed_batch_size)
+                if not batch:
+                    break
+                e0 = perf_counter()
+                vectors = await self.embedder.aembed([c.text for _, c in batch])
+                self.m.observe_ms("ingest_embed_batch_ms", (perf_counter() - e0) * 1000.0)
+                stats.embedded += len(batch)
+                for (pid, _), v in zip(batch, vectors):
+                    if len(stats.samples) >= self.validate_samples:
+                        break
+                    stats.samples.append((pid, v))
+                buffer.extend(self._point(pid, c, v) for (pid, c), v in zip(batch, vectors))
+                del batch, vectors
+                while len(buffer) >= self.upsert_batch_size:
+                    chunk, buffer = buffer[: self.upsert_batch_size], buffer[self.upsert_batch_size :]
+                    if pending is not None:
+                        await pending
+                    pending = asyncio.create_task(self._upsert(chunk, target, stats, progress))
+                if progress:
+                    progress(stats)
+            if pending is not None:
+                await pending
+                pending = None
+            if buffer:
+                await self._upsert(buffer, target, stats, progress)
+                buffer = []
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+        return stats
+
+    async def _validate(self, target: str, stats: IngestStats) -> None:
+        count = await asyncio.to_thread(self.qdrant.count, target)
+        if count != len(stats.point_ids):
+            raise IngestValidationError(f"{target}: expected {len(stats.point_ids)} points, found {count}")
+        if stats.files_total and not count:
+            raise IngestValidationError(f"{target}: no points indexed from {stats.files_total} files")
+        for pid, vector in stats.samples:
+            hits = await asyncio.to_thread(self.qdrant.search, vector, 5, target)
+            if pid not in {h["id"] for h in hits}:
+                raise IngestValidationError(f"{target}: sample point {pid} not retrievable by its own vector")
+
+    def _point(self, pid: str, c: DocChunk, vector: Sequence[float]) -> VectorPoint:
+        return VectorPoint(
+            id=pid,
+            vector=vector,
+            payload={
+                "doc_id": c.doc_id,
+                "title": c.title,
+                "source_path": c.source_path,
+                "text": c.text,
+                "content_hash": content_hash(c.text),
+            },
+        )
+
+    async def _upsert(
+        self,
+        points: List[VectorPoint],
+        target: str,
+        stats: IngestStats,
+        progress: Optional[Callable[[IngestStats], None]],
+    ) -> None:
+        u0 = perf_counter()
+        await asyncio.to_thread(self.qdrant.upsert, points, target)
+        self.m.observe_ms("ingest_upsert_batch_ms", (perf_counter() - u0) * 1000.0)
+        stats.upserted += len(points)
+        if progress:
+            progress(stats)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from typing import Callable, List, Optional
+
+from redis.asyncio.lock import Lock
+from redis.exceptions import LockError, RedisError
+
+from api.app.metrics import Metrics
+from api.rag.indexer import IngestStats
+from api.rag.pipeline import ChatPipeline
+from api.schemas.ingest import IngestJobStatus
+from api.stores.job_store import IngestJobStore
+
+
+log = logging.getLogger("api")
+
+
+def eta_seconds(stats: IngestStats, started_at: float) -> Optional[float]:
+    if not stats.files_total or not stats.files:
+        return None
+    elapsed = time.time() - started_at
+    return elapsed / stats.files * (stats.files_total - stats.files)
+
+
+class IngestWorker:
+    def __init__(
+        self,
+        pipeline_factory: Callable[[], ChatPipeline],
+        jobs: IngestJobStore,
+        metrics: Metrics,
+        lock_timeout_seconds: int = 600,
+        progress_interval_seconds: float = 1.0,
+        poll_timeout_seconds: int = 5,
+    ) -> None:
+        self.pipeline_factory = pipeline_factory
+        self.jobs = jobs
+        self.m = metrics
+        self.lock_timeout_seconds = int(lock_timeout_seconds)
+        self.progress_interval_seconds = float(progress_interval_seconds)
+        self.poll_timeout_seconds = int(poll_timeout_seconds)
+
+    async def run_forever(self) -> None:
+        while True:
+            job = await self.jobs.next(self.poll_timeout_seconds)
+            if job is None:
+                continue
+            try:
+                await self.run_job(job)
+            except Exception:
+                log.exception("ingest_job_crashed", extra={"extra": {"job_id": job.job_id}})
+
+    async def run_job(self, job: IngestJobStatus) -> IngestJobStatus:
+        p = self.pipeline_factory()
+        lock = self.jobs.r.lock(self.jobs.lock_name(job.collection), timeout=self.lock_timeout_seconds)
+        job = await self.jobs.update(job, status="waiting_lock")
+        await lock.acquire()
+        job = await self.jobs.update(job, status="running", started_at=time.time())
+
+        latest: List[IngestStats] = []
+
+        def track(stats: IngestStats) -> None:
+            latest[:] = [stats]
+
+        ingest = asyncio.create_task(p.ingest(job.request, progress=track))
+        reporter = asyncio.create_task(self._report(job, latest, lock, ingest))
+        error: Optional[Exception] = None
+        try:
+            resp = await ingest
+        except asyncio.CancelledError:
+            if not reporter.done() or reporter.cancelled():
+                raise
+            error = LockError(f"ingest lock on {job.collection} lost")
+        except Exception as e:
+            error = e
+            log.exception("ingest_job_failed", extra={"extra": {"job_id": job.job_id}})
+        finally:
+            ingest.cancel()
+            reporter.cancel()
+            with suppress(Exception, asyncio.CancelledError):
+                await reporter
+            try:
+                await lock.release()
+            except LockError:
+                log.warning("ingest_lock_lost", extra={"extra": {"job_id": job.job_id, "collection": job.collection}})
+            except RedisError:
+                log.warning("ingest_lock_release_failed", extra={"extra": {"job_id": job.job_id, "collection": job.collection}})
+
+        job = self._with_stats(job, latest)
+        if error is not None:
+            self.m.inc("ingest_job_failed")
+            return await self.jobs.update(job, status="failed", finished_at=time.time(), errors=job.errors + [str(error)])
+        self.m.inc("ingest_job_done")
+        log.info("ingest_job_done", extra={"extra": {"job_id": job.job_id, **resp.model_dump()}})
+        return await self.jobs.update(job, status="done", finished_at=time.time(), eta_seconds=0.0, result=resp)
+
+    async def _report(self, job: IngestJobStatus, latest: List[IngestStats], lock: Lock, ingest: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(self.progress_interval_seconds)
+            try:
+                await lock.reacquire()
+            except LockError:
+                self.m.inc("ingest_lock_lost")
+                log.warning("ingest_lock_lost", extra={"extra": {"job_id": job.job_id, "collection": job.collection}})
+                ingest.cancel()
+                return
+            except RedisError:
+                log.warning("ingest_lock_refresh_failed", extra={"extra": {"job_id": job.job_id}})
+                continue
+            if latest:
+                try:
+                    await self.jobs.save(self._with_stats(job, latest))
+                except RedisError:
+                    log.warning("ingest_progress_save_failed", extra={"extra": {"job_id": job.job_id}})
+
+    def _with_stats(self, job: IngestJobStatus, latest: List[IngestStats]) -> IngestJobStatus:
+        if not latest:
+            return job
+        s = latest[0]
+        return job.model_copy(
+            update={
+                "files": s.files,
+                "files_total": s.files_total,
+                "chunks": s.chunks,
+                "embedded": s.embedded,
+                "upserted": s.upserted,
+                "errors": list(s.errors),
+                "eta_seconds": eta_seconds(s, job.started_at or time.time()),
+            }
+        )
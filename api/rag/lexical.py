@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+SPLIT_RE = re.compile(r"\d+|[^\W\d_]+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    out = []
+    for tok in TOKEN_RE.findall(text.lower()):
+        out.append(tok)
+        parts = SPLIT_RE.findall(tok)
+        if len(parts) > 1:
+            out.extend(parts)
+    return out
+
+
+class LexicalIndex:
+    def __init__(
+        self,
+        path: Path,
+        vocab: Dict[str, int],
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        tfs: np.ndarray,
+        doc_len: np.ndarray,
+        text_offsets: np.ndarray,
+        texts: np.ndarray,
+        meta: List[dict],
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> None:
+        self.path = path
+        self.vocab = vocab
+        self.offsets = offsets
+        self.postings = postings
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.text_offsets = text_offsets
+        self.texts = texts
+        self.meta = meta
+        self.k1 = float(k1)
+        self.b = float(b)
+        self.n_docs = int(doc_len.shape[0])
+        self.avgdl = float(doc_len.mean()) if self.n_docs else 0.0
+        self.norm = self.k1 * (1.0 - self.b + self.b * doc_len / max(self.avgdl, 1e-9))
+        self._rows: Optional[Dict[str, int]] = None
+
+    @staticmethod
+    def write(path: Path, docs: Iterable[Tuple[str, dict]]) -> int:
+        path.mkdir(parents=True, exist_ok=True)
+        vocab: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+        doc_len: List[int] = []
+        meta: List[dict] = []
+        text_offsets = [0]
+        with open(path / "texts.bin", "wb") as f:
+            for i, (pid, payload) in enumerate(docs):
+                text = str(payload.get("text", ""))
+                toks = tokenize(f"{payload.get('title', '')} {text}")
+                doc_len.append(len(toks))
+                for term, tf in Counter(toks).items():
+                    t = vocab.setdefault(term, len(vocab))
+                    if t == len(postings):
+                        postings.append([])
+                    postings[t].append((i, tf))
+                raw = text.encode("utf-8")
+                f.write(raw)
+                text_offsets.append(text_offsets[-1] + len(raw))
+                meta.append(
+                    {
+                        "id": pid,
+                        "doc_id": str(payload.get("doc_id", "")),
+                        "title": str(payload.get("title", "")),
+                        "source_path": str(payload.get("source_path", "")),
+                    }
+                )
+        offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in postings])
+        flat = [x for p in postings for x in p]
+        np.save(path / "offsets.npy", offsets)
+        np.save(path / "postings.npy", np.array([d for d, _ in flat], dtype=np.int32))
+        np.save(path / "tfs.npy", np.array([tf for _, tf in flat], dtype=np.uint16))
+        np.save(path / "doc_len.npy", np.array(doc_len, dtype=np.int32))
+        np.save(path / "text_offsets.npy", np.array(text_offsets, dtype=np.int64))
+        (path / "vocab.json").write_text(json.dumps(vocab, ensure_ascii=False), encoding="utf-8")
+        (path / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        return len(meta)
+
+    @classmethod
+    def load(cls, path: Path) -> "LexicalIndex":
+        texts_path = path / "texts.bin"
+        texts = (
+            np.memmap(texts_path, dtype=np.uint8, mode="r")
+            if texts_path.stat().st_size
+            else np.zeros(0, dtype=np.uint8)
+        )
+        return cls(
+            path=path,
+            vocab=json.loads((path / "vocab.json").read_text(encoding="utf-8")),
+            offsets=np.load(path / "offsets.npy", mmap_mode="r"),
+            postings=np.load(path / "postings.npy", mmap_mode="r"),
+            tfs=np.load(path / "tfs.npy", mmap_mode="r"),
+            doc_len=np.load(path / "doc_len.npy"),
+            text_offsets=np.load(path / "text_offsets.npy", mmap_mode="r"),
+            texts=texts,
+            meta=json.loads((path / "meta.json").read_text(encoding="utf-8")),
+        )
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        if not self.n_docs:
+            return []
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            lo, hi = int(self.offsets[t]), int(self.offsets[t + 1])
+            docs = self.postings[lo:hi]
+            tf = self.tfs[lo:hi].astype(np.float32)
+            idf = math.log(1.0 + (self.n_docs - (hi - lo) + 0.5) / ((hi - lo) + 0.5))
+            scores[docs] += idf * tf * (self.k1 + 1.0) / (tf + self.norm[docs])
+        k = min(int(top_k), self.n_docs)
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx])]
+        return [(int(i), float(scores[i])) for i in idx if scores[i] > 0]
+
+    def row(self, doc_id: str) -> Optional[int]:
+        if self._rows is None:
+            self._rows = {m["doc_id"]: i for i, m in enumerate(self.meta)}
+        return self._rows.get(doc_id)
+
+    def text(self, i: int) -> str:
+        lo, hi = int(self.text_offsets[i]), int(self.text_offsets[i + 1])
+        return bytes(self.texts[lo:hi]).decode("utf-8")
+
+
+class LexicalIndexStore:
+    def __init__(self, root: str, name: str) -> None:
+        self.root = Path(root) / name
+        self._lock = threading.Lock()
+        self._loaded: Optional[Tuple[str, LexicalIndex]] = None
+        self._version: Optional[int] = None
+
+    def _pointer(self) -> Path:
+        return self.root / "CURRENT"
+
+    def publish(self, docs: Iterable[Tuple[str, dict]], label: str) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        target = self.root / f"{label}-{int(time.time() * 1000)}"
+        LexicalIndex.write(target, docs)
+        previous = self._read_pointer()
+        tmp = self.root / "CURRENT.tmp"
+        tmp.write_text(target.name, encoding="utf-8")
+        os.replace(tmp, self._pointer())
+        for old in self.root.iterdir():
+            if old.is_dir() and old.name not in (target.name, previous):
+                shutil.rmtree(old, ignore_errors=True)
+        return target
+
+    def _read_pointer(self) -> Optional[str]:
+        try:
+            return self._pointer().read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+
+    def current(self, version: Optional[int] = None) -> Optional[LexicalIndex]:
+        with self._lock:
+            if version is not None and version == self._version and self._loaded is not None:
+                return self._loaded[1]
+            name = self._read_pointer()
+            while self._loaded is None or self._loaded[0] != name:
+                if name is None:
+                    return None
+                try:
+                    self._loaded = (name, LexicalIndex.load(self.root / name))
+                except OSError:
+                    latest = self._read_pointer()
+                    if latest == name:
+                        return None
+                    name = latest
+            self._version = version
+            return self._loaded[1]
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from api.settings import Settings
+from api.app.metrics import Metrics
+
+
+log = logging.getLogger("api")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMClient:
+    def __init__(self, settings: Settings, metrics: Optional[Metrics] = None) -> None:
+        self.s = settings
+        self.m = metrics
+        self.max_retries = max(0, int(settings.llm_max_retries))
+        self.backoff_seconds = float(settings.llm_retry_backoff_seconds)
+        self._sem = asyncio.Semaphore(max(1, int(settings.llm_max_concurrency)))
+        self._client = httpx.AsyncClient(
+            timeout=settings.llm_timeout_seconds,
+            http2=settings.llm_http2,
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive_connections,
+                keepalive_expiry=settings.llm_keepalive_expiry_seconds,
+            ),
+            headers={"Authorization": f"Bearer {settings.llm_api_key}"} if settings.llm_api_key else None,
+        )
+
+    def url(self) -> str:
+        base = (self.s.llm_base_url or "").rstrip("/")
+        if base:
+            return f"{base}/chat/completions"
+        return "https://api.openai.com/v1/chat/completions"
+
+    def payload(self, messages: List[Dict[str, str]], stream: bool = False) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "model": self.s.llm_model,
+            "messages": messages,
+            "max_tokens": self.s.llm_max_output_tokens,
+            "temperature": 0.2,
+        }
+        if stream:
+            out["stream"] = True
+        return out
+
+    async def complete(self, messages: List[Dict[str, str]]) -> str:
+        if not self.s.llm_api_key:
+            return "LLM_API_KEY не задан."
+        async with self._request(self.payload(messages)) as r:
+            await r.aread()
+            data = r.json()
+        return (data["choices"][0]["message"]["content"] or "").strip()
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        if not self.s.llm_api_key:
+            yield "LLM_API_KEY не задан."
+            return
+        async with self._request(self.payload(messages, stream=True)) as r:
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    choice = json.loads(data)["choices"][0]
+                except (ValueError, KeyError, IndexError):
+                    continue
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+
+    @asynccontextmanager
+    async def _request(self, payload: Dict[str, Any]) -> AsyncIterator[httpx.Response]:
+        async with self._sem:
+            attempt = 0
+            while True:
+                req = self._client.build_request("POST", self.url(), json=payload)
+                try:
+                    r = await self._client.send(req, stream=True)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError) as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = self._backoff(attempt, None)
+                    log.warning("llm_retry", extra={"extra": {"attempt": attempt + 1, "error": type(e).__name__, "delay_s": delay}})
+                else:
+                    if r.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                        try:
+                            r.raise_for_status()
+                            yield r
+                        finally:
+                            await r.aclose()
+                        return
+                    delay = self._backoff(attempt, r.headers.get("retry-after"))
+                    await r.aclose()
+                    log.warning("llm_retry", extra={"extra": {"attempt": attempt + 1, "status": r.status_code, "delay_s": delay}})
+                if self.m:
+                    self.m.inc("llm_retry")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.s.llm_timeout_seconds)
+            except ValueError:
+                pass
+        base = self.backoff_seconds * (2 ** attempt)
+        return base + random.uniform(0, base / 2)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+MODEL_FILES = ("model_int8.onnx", "model.onnx")
+
+
+def _model_file(root: Path) -> Path:
+    if root.is_file():
+        return root
+    for name in MODEL_FILES:
+        if (root / name).exists():
+            return root / name
+    raise FileNotFoundError(f"no ONNX model in {root} (expected one of {', '.join(MODEL_FILES)})")
+
+
+class OnnxEncoder:
+    def __init__(self, path: str, max_length: int = 256, threads: int = 0, batch_size: int = 32) -> None:
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_file = _model_file(Path(path))
+        self.model_file = str(model_file)
+        self.tokenizer = Tokenizer.from_file(str(model_file.parent / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=int(max_length))
+        pad_id = self.tokenizer.token_to_id("[PAD]")
+        self.tokenizer.enable_padding(pad_id=pad_id or 0, pad_token="[PAD]" if pad_id is not None else "<pad>")
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = int(threads)
+        self.session = ort.InferenceSession(self.model_file, opts, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        out = self.session.get_outputs()[0]
+        self.output = out.name
+        self.dim = int(out.shape[-1])
+        self.batch_size = max(1, int(batch_size))
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _run(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in enc], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.inputs:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in enc], dtype=np.int64)
+        hidden = self.session.run([self.output], feeds)[0]
+        if hidden.ndim == 2:
+            return hidden.astype(np.float32, copy=False)
+        m = mask[:, :, None].astype(np.float32)
+        return (hidden * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1e-9)
+
+    def encode(
+        self,
+        texts: List[str],
+        normalize_embeddings: bool = True,
+        show_progress_bar: bool = False,
+        batch_size: Optional[int] = None,
+    ) -> np.ndarray:
+        bs = int(batch_size or self.batch_size)
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        for lo in range(0, len(texts), bs):
+            idx = order[lo : lo + bs]
+            out[idx] = self._run([texts[i] for i in idx])
+        if normalize_embeddings and len(texts):
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out
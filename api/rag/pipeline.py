@@ -1,166 +1,449 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from time import perf_counter
-from typing import Any, Dict, List
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from time import perf_counter, time_ns
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 
 import httpx
 
 from api.settings import Settings
 from api.app.metrics import Metrics
+from api.app.tracing import Tracer, span
 from api.schemas.chat import ChatRequest, ChatResponse, Source
-from api.schemas.search import SearchRequest, SearchResponse
+from api.schemas.search import SearchBatchRequest, SearchBatchResponse, SearchRequest, SearchResponse
 from api.schemas.ingest import IngestRequest, IngestResponse
-from api.stores.redis_store import RedisConversationStore
-from api.stores.qdrant_store import QdrantStore
-from api.rag.embeddings import EmbeddingClient
+from api.stores.redis_store import AsyncRedisConversationStore
+from api.stores.base import VectorStore
+from api.rag.embeddings import Embedder
+from api.rag.llm import LLMClient
 from api.intent.routing import IntentRouter
-from api.rag.chunking import build_chunks
-from api.rag.retriever import Retriever
+from api.rag.retriever import Retriever, RetrievedChunk
+from api.rag.rerank import CrossEncoderReranker
+from api.rag.summarizer import ConversationSummarizer
+from api.rag.indexer import Indexer, IngestStats
 from api.rag.gating import decide
-from api.rag.prompts import SYSTEM_RAG, build_context, build_messages
-
-from qdrant_client.http import models as qm
+from api.rag.semantic_cache import SemanticCache, source_signature
+from api.rag.lru import LocalCache
+from api.rag.lexical import LexicalIndexStore
+from api.rag.prompts import SYSTEM_RAG, PromptPlan, assemble_messages
+from api.rag.tokens import TokenCounter
 
 
 log = logging.getLogger("api")
 
 
+def _discard(task: Optional[asyncio.Task]) -> None:
+    if task is None:
+        return
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+@dataclass
+class ChatTurn:
+    intent: str
+    debug: Dict[str, Any]
+    answer: Optional[str] = None
+    chunks: List[RetrievedChunk] = field(default_factory=list)
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    vector: Optional[Sequence[float]] = None
+    signature: Optional[str] = None
+    writes: List[Tuple[str, int, bytes]] = field(default_factory=list)
+
+
 class ChatPipeline:
     def __init__(
         self,
         settings: Settings,
         metrics: Metrics,
-        conv_store: RedisConversationStore,
-        qdrant: QdrantStore,
-        embedder: EmbeddingClient,
+        conv_store: AsyncRedisConversationStore,
+        qdrant: VectorStore,
+        embedder: Embedder,
+        llm: LLMClient,
         intent_router: IntentRouter,
+        semantic_cache: Optional[SemanticCache] = None,
+        retrieval_cache: Optional[LocalCache] = None,
+        lexical: Optional[LexicalIndexStore] = None,
+        reranker: Optional[CrossEncoderReranker] = None,
+        token_counter: Optional[TokenCounter] = None,
+        summarizer: Optional[ConversationSummarizer] = None,
+        tracer: Optional[Tracer] = None,
+        ingest_pool: Optional[Executor] = None,
     ) -> None:
         self.s = settings
         self.m = metrics
         self.conv = conv_store
         self.qdrant = qdrant
         self.embedder = embedder
+        self.llm = llm
         self.intent_router = intent_router
+        self.sem_cache = semantic_cache
+        self.tokens = token_counter or TokenCounter()
+        self.summarizer = summarizer
+        self.tracer = tracer or Tracer()
         self.retriever = Retriever(
             qdrant=qdrant,
             embedder=embedder,
             cache=conv_store,
             cache_ttl_seconds=settings.retriever_cache_ttl_seconds,
             top_k=settings.retriever_top_k,
+            l1=retrieval_cache,
+            version_refresh_seconds=settings.retriever_version_refresh_seconds,
+            metrics=metrics,
+            lexical=lexical,
+            mode=settings.retriever_mode,
+            hybrid_candidates=settings.retriever_hybrid_candidates,
+            rrf_k=settings.retriever_rrf_k,
+            reranker=reranker,
+            rerank_candidates=settings.rerank_candidates,
+            rerank_budget_ms=settings.rerank_budget_ms,
+        )
+        self.indexer = Indexer(
+            qdrant=qdrant,
+            embedder=embedder,
+            store=conv_store,
+            metrics=metrics,
+            embed_batch_size=settings.ingest_embed_batch_size,
+            upsert_batch_size=settings.ingest_upsert_batch_size,
+            workers=settings.ingest_workers,
+            keep_versions=settings.qdrant_keep_versions,
+            validate_samples=settings.ingest_validate_samples,
+            lexical=lexical,
+            pool=ingest_pool,
+            parallel_min_files=settings.ingest_parallel_min_files,
+            parallel_min_bytes=settings.ingest_parallel_min_bytes,
         )
 
     async def chat(self, req: ChatRequest) -> ChatResponse:
         t0 = perf_counter()
-        intent = self.intent_router.route(req.message)
+        with self.tracer.trace("chat") as tr:
+            turn = await self._plan(req)
+
+            if turn.answer is None:
+                g0 = perf_counter()
+                with span("generate", timed=False):
+                    turn.answer = await self._generate(turn.messages)
+                self.m.observe_ms("generate_ms", (perf_counter() - g0) * 1000.0)
+                self._remember(turn)
+
+            sources = self._sources(turn.chunks)
+            with span("redis.persist"):
+                await self._append_answer(req.conversation_id, turn)
+
+            elapsed_ms = (perf_counter() - t0) * 1000.0
+            self.m.observe_ms("chat_total", elapsed_ms)
+            if turn.debug.get("mode") == "rag":
+                log.info("chat", extra={"extra": {"conversation_id": req.conversation_id, "intent": turn.intent, "sources": len(sources)}})
+            if req.trace:
+                turn.debug["trace_id"] = tr.trace_id
+                turn.debug["timings_ms"] = {**tr.breakdown(), "chat": round(elapsed_ms, 3)}
+            return ChatResponse(
+                conversation_id=req.conversation_id,
+                intent=turn.intent,
+                answer=turn.answer,
+                sources=sources,
+                debug=turn.debug,
+            )
+
+    async def chat_stream(self, req: ChatRequest) -> AsyncIterator[Tuple[str, Any]]:
+        t0 = perf_counter()
+        tr = self.tracer.start("chat_stream")
+        try:
+            try:
+                with self.tracer.activate(tr):
+                    turn = await self._plan(req)
+            except Exception as e:
+                yield self._stream_failed(req, "plan", e)
+                return
+            sources = self._sources(turn.chunks)
+            yield "sources", [x.model_dump() for x in sources]
+
+            if turn.answer is not None:
+                self.m.observe_ms("ttft_ms", (perf_counter() - t0) * 1000.0)
+                yield "token", {"delta": turn.answer}
+            else:
+                parts: List[str] = []
+                g0, g0_ns = perf_counter(), time_ns()
+                try:
+                    async for delta in self._generate_stream(turn.messages):
+                        if not parts:
+                            self.m.observe_ms("ttft_ms", (perf_counter() - t0) * 1000.0)
+                        parts.append(delta)
+                        yield "token", {"delta": delta}
+                except Exception as e:
+                    yield self._stream_failed(req, "generation", e)
+                    return
+                generate_ms = (perf_counter() - g0) * 1000.0
+                tr.record("generate", g0_ns, generate_ms, chunks=len(parts))
+                self.m.observe_ms("generate_ms", generate_ms)
+                turn.answer = "".join(parts).strip()
+                self._remember(turn)
+
+            try:
+                with self.tracer.activate(tr), span("redis.persist"):
+                    await self._append_answer(req.conversation_id, turn)
+            except Exception as e:
+                yield self._stream_failed(req, "persist", e)
+                return
+            elapsed_ms = (perf_counter() - t0) * 1000.0
+            self.m.observe_ms("chat_total", elapsed_ms)
+            if turn.debug.get("mode") == "rag":
+                log.info("chat", extra={"extra": {"conversation_id": req.conversation_id, "intent": turn.intent, "sources": len(sources), "stream": True}})
+            if req.trace:
+                turn.debug["trace_id"] = tr.trace_id
+                turn.debug["timings_ms"] = {**tr.breakdown(), "chat": round(elapsed_ms, 3)}
+            yield "done", {"conversation_id": req.conversation_id, "intent": turn.intent, "debug": turn.debug}
+        finally:
+            self.tracer.finish(tr)
+
+    def _stream_failed(self, req: ChatRequest, stage: str, e: Exception) -> Tuple[str, Any]:
+        self.m.inc("stream_error")
+        log.warning(
+            "chat_stream_failed",
+            exc_info=not isinstance(e, httpx.HTTPError),
+            extra={"extra": {"conversation_id": req.conversation_id, "stage": stage, "error": str(e)}},
+        )
+        return "error", {"detail": f"{stage}_failed"}
+
+    async def _plan(self, req: ChatRequest) -> ChatTurn:
+        if self.s.chat_speculative_retrieval:
+            return await self._plan_speculative(req)
+        vector = None
+        with span("intent"):
+            intent = self.intent_router.resolve(req.message)
+            if intent is None:
+                if self.intent_router.needs_vector:
+                    with span("embed"):
+                        vector = (await self.embedder.aembed([req.message]))[0]
+                intent = self.intent_router.classify(req.message, vector)
         self.m.inc(f"intent_{intent}")
 
-        self.conv.append(req.conversation_id, "user", req.message)
-        history = self.conv.history(req.conversation_id)
-        summary = self.conv.get_summary(req.conversation_id)
+        rag = intent not in ("CTA", "OPERATOR")
+        with span("redis.load"):
+            key = await self.retriever.prefetch_key(req.message) if rag else None
+            history, summary, prefetched = await self.conv.append_and_load(
+                req.conversation_id, "user", req.message, keys=[key] if key else ()
+            )
 
-        if intent == "CTA":
-            answer = self._cta_answer()
-            self.conv.append(req.conversation_id, "assistant", answer)
-            self.m.observe_ms("chat_total", (perf_counter() - t0) * 1000.0)
-            return ChatResponse(conversation_id=req.conversation_id, intent=intent, answer=answer, sources=[], debug={"mode": "cta"})
+        if not rag:
+            return self._direct_turn(intent)
+
+        r0 = perf_counter()
+        if vector is None and self.sem_cache is not None:
+            with span("embed"):
+                vector = (await self.embedder.aembed([req.message]))[0]
+        writes: List[Tuple[str, int, bytes]] = []
+        chunks = await self.retriever.retrieve(req.message, vector=vector, prefetched=prefetched, writes=writes)
+        self.m.observe_ms("retrieve_ms", (perf_counter() - r0) * 1000.0)
+        return await self._rag_turn(req, history, summary, chunks, vector, writes)
 
-        if intent == "OPERATOR":
-            answer = self._operator_answer()
-            self.conv.append(req.conversation_id, "assistant", answer)
-            self.m.observe_ms("chat_total", (perf_counter() - t0) * 1000.0)
-            return ChatResponse(conversation_id=req.conversation_id, intent=intent, answer=answer, sources=[], debug={"mode": "operator"})
+    async def _plan_speculative(self, req: ChatRequest) -> ChatTurn:
+        t0 = perf_counter()
+        ends: Dict[str, float] = {}
+        with span("intent"):
+            intent = self.intent_router.resolve(req.message)
+        ends["intent"] = perf_counter()
 
+        writes: List[Tuple[str, int, bytes]] = []
+        key: Optional[str] = None
+        vec_task: Optional[asyncio.Task] = None
+        retrieval: Optional[asyncio.Task] = None
+        if intent is None or intent == "RAG":
+            key = await self.retriever.prefetch_key(req.message)
+            if key is not None or (intent is None and self.intent_router.needs_vector) or self.sem_cache is not None:
+                vec_task = asyncio.create_task(self._embed(req.message))
+            retrieval = asyncio.create_task(self._branch(ends, "retrieval", self._speculate, req.message, key, vec_task))
+        load = asyncio.create_task(
+            self._branch(
+                ends, "redis.load", self.conv.append_and_load, req.conversation_id, "user", req.message, keys=[key] if key else ()
+            )
+        )
+        tasks = [t for t in (vec_task, retrieval, load) if t is not None]
+        try:
+            if intent is None:
+                vector = await vec_task if vec_task is not None and self.intent_router.needs_vector else None
+                with span("intent"):
+                    intent = self.intent_router.classify(req.message, vector)
+                ends["intent"] = perf_counter()
+            self.m.inc(f"intent_{intent}")
+
+            if intent in ("CTA", "OPERATOR"):
+                if retrieval is not None:
+                    self.m.inc("speculative_retrieval_wasted" if retrieval.done() else "speculative_retrieval_cancelled")
+                    ends.pop("retrieval", None)
+                    for t in (retrieval, vec_task):
+                        _discard(t)
+                await load
+                self._observe_critical_path(t0, ends)
+                return self._direct_turn(intent)
+
+            history, summary, prefetched = await load
+            if key is not None and prefetched.get(key):
+                self.m.inc("speculative_retrieval_superseded")
+                _discard(retrieval)
+                chunks = await self.retriever.retrieve(req.message, vector=vec_task, prefetched=prefetched, writes=writes)
+                ends["retrieval"] = perf_counter()
+            else:
+                chunks, fills = await retrieval
+                writes.extend(fills)
+            vector = None
+            if vec_task is not None:
+                if self.sem_cache is not None or vec_task.done():
+                    vector = await vec_task
+                else:
+                    _discard(vec_task)
+        except BaseException:
+            for t in tasks:
+                _discard(t)
+            raise
+        self._observe_critical_path(t0, ends)
+        return await self._rag_turn(req, history, summary, chunks, vector, writes)
+
+    async def _embed(self, text: str) -> Sequence[float]:
+        with span("embed"):
+            return (await self.embedder.aembed([text]))[0]
+
+    async def _speculate(
+        self, query: str, key: Optional[str], vec_task: Optional[asyncio.Task]
+    ) -> Tuple[List[RetrievedChunk], List[Tuple[str, int, bytes]]]:
         r0 = perf_counter()
-        chunks = self.retriever.retrieve(req.message)
+        fills: List[Tuple[str, int, bytes]] = []
+        vector = await asyncio.shield(vec_task) if vec_task is not None else None
+        chunks = await self.retriever.retrieve(query, vector=vector, prefetched={key: None} if key else None, writes=fills)
         self.m.observe_ms("retrieve_ms", (perf_counter() - r0) * 1000.0)
+        return chunks, fills
+
+    async def _branch(self, ends: Dict[str, float], name: str, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        with span(name):
+            out = await fn(*args, **kwargs)
+        ends[name] = perf_counter()
+        return out
 
-        gate = decide(chunks, self.s.retriever_min_score)
+    def _observe_critical_path(self, t0: float, ends: Dict[str, float]) -> None:
+        last = max(ends, key=ends.__getitem__)
+        self.m.inc(f"plan_critical_{last}")
+        self.m.observe_ms("plan_ms", (ends[last] - t0) * 1000.0)
+
+    def _direct_turn(self, intent: str) -> ChatTurn:
+        if intent == "CTA":
+            return ChatTurn(intent=intent, debug={"mode": "cta"}, answer=self._cta_answer())
+        return ChatTurn(intent=intent, debug={"mode": "operator"}, answer=self._operator_answer())
+
+    async def _rag_turn(
+        self,
+        req: ChatRequest,
+        history: List[Dict[str, str]],
+        summary: Optional[str],
+        chunks: List[RetrievedChunk],
+        vector: Optional[Sequence[float]],
+        writes: List[Tuple[str, int, bytes]],
+    ) -> ChatTurn:
+        gate = decide(
+            chunks,
+            self.s.retriever_min_score,
+            self.s.retriever_min_lexical_score,
+            self.s.retriever_min_rerank_score,
+        )
         if not gate.ok:
             self.m.inc("fallback")
-            answer = self._fallback_answer(gate.reason)
-            self.conv.append(req.conversation_id, "assistant", answer)
-            self.m.observe_ms("chat_total", (perf_counter() - t0) * 1000.0)
-            return ChatResponse(
-                conversation_id=req.conversation_id,
+            return ChatTurn(
                 intent="RAG",
-                answer=answer,
-                sources=[],
                 debug={"mode": "fallback", "reason": gate.reason},
+                answer=self._fallback_answer(gate.reason),
+                writes=writes,
             )
 
-        context = build_context(chunks)
-        msgs = build_messages(SYSTEM_RAG, history, req.message, context, summary)
-
-        g0 = perf_counter()
-        answer = await self._generate(msgs)
-        self.m.observe_ms("generate_ms", (perf_counter() - g0) * 1000.0)
+        signature = None
+        if self.sem_cache is not None and vector is not None:
+            version = await self.retriever.index_version()
+            signature = f"v{version}:{source_signature(c.doc_id for c in chunks)}"
+            with span("semantic_cache"):
+                cached = self.sem_cache.get(signature, vector)
+            if cached is not None:
+                self.m.inc("semantic_cache_hit")
+                return ChatTurn(intent="RAG", debug={"mode": "rag", "gate": gate.reason, "cache": "semantic"}, answer=cached, chunks=chunks, writes=writes)
+            self.m.inc("semantic_cache_miss")
 
-        sources = [Source(doc_id=c.doc_id, title=c.title, score=c.score, source_path=c.source_path) for c in chunks]
-        self.conv.append(req.conversation_id, "assistant", answer)
-
-        self.m.observe_ms("chat_total", (perf_counter() - t0) * 1000.0)
-        log.info("chat", extra={"extra": {"conversation_id": req.conversation_id, "intent": intent, "sources": len(sources)}})
-        return ChatResponse(
-            conversation_id=req.conversation_id,
+        with span("prompt"):
+            plan = assemble_messages(
+                SYSTEM_RAG,
+                history,
+                req.message,
+                chunks,
+                summary,
+                counter=self.tokens,
+                max_tokens=self.s.prompt_max_input_tokens,
+                summary_max_tokens=self.s.prompt_summary_max_tokens,
+                history_min_tokens=self.s.prompt_history_min_tokens,
+                dedup_threshold=self.s.prompt_dedup_threshold,
+            )
+        self._observe_prompt(plan)
+        return ChatTurn(
             intent="RAG",
-            answer=answer,
-            sources=sources,
-            debug={"mode": "rag", "gate": gate.reason},
+            debug={"mode": "rag", "gate": gate.reason, "prompt_tokens": plan.tokens["total"]},
+            chunks=plan.chunks,
+            messages=plan.messages,
+            vector=vector,
+            signature=signature,
+            writes=writes,
         )
 
+    async def _append_answer(self, conversation_id: str, turn: ChatTurn) -> None:
+        n = await self.conv.append(conversation_id, "assistant", turn.answer, writes=turn.writes)
+        if self.summarizer is not None:
+            self.summarizer.submit(conversation_id, n)
+
+    def _observe_prompt(self, plan: PromptPlan) -> None:
+        for part, n in plan.tokens.items():
+            self.m.observe("prompt_tokens" if part == "total" else f"prompt_{part}_tokens", n)
+        self.m.inc("context_chunks_deduped", plan.deduped)
+        self.m.inc("context_chunks_merged", plan.merged)
+        self.m.inc("history_messages_dropped", plan.history_dropped)
+
+    def _remember(self, turn: ChatTurn) -> None:
+        if self.sem_cache is None or turn.signature is None or turn.vector is None or not turn.answer:
+            return
+        self.sem_cache.put(turn.signature, turn.vector, turn.answer)
+
+    def _sources(self, chunks: List[RetrievedChunk]) -> List[Source]:
+        return [
+            Source(doc_id=c.doc_id, title=c.title, score=c.score, source_path=c.source_path, doc_ids=list(c.merged_ids or (c.doc_id,)))
+            for c in chunks
+        ]
+
     async def search(self, req: SearchRequest) -> SearchResponse:
-        chunks = self.retriever.retrieve(req.query, top_k=req.top_k)
-        results = [Source(doc_id=c.doc_id, title=c.title, score=c.score, source_path=c.source_path) for c in chunks]
+        chunks = await self.retriever.retrieve(req.query, top_k=req.top_k)
+        results = self._sources(chunks)
         return SearchResponse(query=req.query, results=results)
 
-    async def ingest(self, req: IngestRequest) -> IngestResponse:
-        chunks = build_chunks(req.docs_path, limit=req.limit)
-        dim = self.embedder.dim()
-        self.qdrant.ensure_collection(vector_size=dim, recreate=req.recreate)
-
-        texts = [c.text for c in chunks]
-        vectors = self.embedder.embed(texts)
-
-        points = []
-        for idx, (c, v) in enumerate(zip(chunks, vectors)):
-            points.append(
-                qm.PointStruct(
-                    id=idx,
-                    vector=v,
-                    payload={
-                        "doc_id": c.doc_id,
-                        "title": c.title,
-                        "source_path": c.source_path,
-                        "text": c.text,
-                    },
-                )
-            )
-        if points:
-            self.qdrant.upsert(points)
-        return IngestResponse(indexed_chunks=len(points), collection=self.qdrant.collection)
+    async def search_many(self, req: SearchBatchRequest) -> SearchBatchResponse:
+        batches = await self.retriever.retrieve_many([q.query for q in req.queries], top_k=[q.top_k for q in req.queries])
+        return SearchBatchResponse(
+            results=[SearchResponse(query=q.query, results=self._sources(chunks)) for q, chunks in zip(req.queries, batches)]
+        )
+
+    async def ingest(
+        self,
+        req: IngestRequest,
+        progress: Optional[Callable[[IngestStats], None]] = None,
+    ) -> IngestResponse:
+        resp, changed = await self.indexer.run(req, progress=progress)
+        if changed:
+            await self.retriever.bump_version()
+            if self.sem_cache is not None:
+                self.sem_cache.clear()
+        return resp
 
     async def _generate(self, messages: List[Dict[str, str]]) -> str:
-        if not self.s.llm_api_key:
-            return "LLM_API_KEY не задан."
-        headers = {"Authorization": f"Bearer {self.s.llm_api_key}"}
-        payload: Dict[str, Any] = {
-            "model": self.s.llm_model,
-            "messages": messages,
-            "max_tokens": self.s.llm_max_output_tokens,
-            "temperature": 0.2,
-        }
-        async with httpx.AsyncClient(timeout=self.s.llm_timeout_seconds) as client:
-            r = await client.post(self._llm_url(), headers=headers, json=payload)
-            r.raise_for_status()
-            data = r.json()
-            return (data["choices"][0]["message"]["content"] or "").strip()
-
-    def _llm_url(self) -> str:
-        base = (self.s.llm_base_url or "").rstrip("/")
-        if base:
-            return f"{base}/chat/completions"
-        return "https://api.openai.com/v1/chat/completions"
+        return await self.llm.complete(messages)
+
+    def _generate_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        return self.llm.stream(messages)
 
     def _cta_answer(self) -> str:
         return "Могу подготовить КП. Оставь телефон или email и укажи: объём (тонны), ширина/толщина, сплав/состояние, город доставки."
@@ -1,25 +1,195 @@
 from __future__ import annotations
 
-from typing import List, Dict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
 from api.rag.retriever import RetrievedChunk
+from api.rag.tokens import WORD_RE, TokenCounter
+
+CONTEXT_HEADER = "Контекст из базы знаний:\n"
+SUMMARY_HEADER = "Краткий контекст диалога:\n"
+
+
+@dataclass
+class PromptPlan:
+    messages: List[Dict[str, str]]
+    chunks: List[RetrievedChunk]
+    tokens: Dict[str, int]
+    deduped: int = 0
+    merged: int = 0
+    history_dropped: int = 0
+    truncated: List[str] = field(default_factory=list)
 
 
 def build_context(chunks: List[RetrievedChunk]) -> str:
     parts = []
     for i, c in enumerate(chunks, start=1):
-        parts.append(f"[{i}] {c.title} ({c.doc_id})\n{c.text}")
+        parts.append(_format_chunk(i, c))
     return "\n\n".join(parts).strip()
 
 
+def _format_chunk(i: int, c: RetrievedChunk) -> str:
+    return f"[{i}] {c.title} ({', '.join(c.merged_ids or (c.doc_id,))})\n{c.text}"
+
+
+def _shingles(text: str, n: int = 3) -> Set[Tuple[str, ...]]:
+    words = [w.lower() for w in WORD_RE.findall(text)]
+    if len(words) < n:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i : i + n]) for i in range(len(words) - n + 1)}
+
+
+def dedup_chunks(chunks: List[RetrievedChunk], threshold: float) -> List[RetrievedChunk]:
+    kept: List[RetrievedChunk] = []
+    seen: List[Set[Tuple[str, ...]]] = []
+    for c in chunks:
+        sh = _shingles(c.text)
+        if sh and any(len(sh & other) / min(len(sh), len(other)) >= threshold for other in seen if other):
+            continue
+        kept.append(c)
+        seen.append(sh)
+    return kept
+
+
+def _position(doc_id: str) -> Tuple[str, Optional[int]]:
+    stem, _, idx = doc_id.rpartition(":")
+    return (stem, int(idx)) if stem and idx.isdigit() else (doc_id, None)
+
+
+def merge_adjacent(chunks: List[RetrievedChunk]) -> List[RetrievedChunk]:
+    groups: List[Dict[int, RetrievedChunk]] = []
+    heads: List[RetrievedChunk] = []
+    for c in chunks:
+        stem, idx = _position(c.doc_id)
+        if idx is None:
+            groups.append({})
+            heads.append(c)
+            continue
+        hits = [g for g, h in enumerate(heads) if groups[g] and _position(h.doc_id)[0] == stem and (idx - 1 in groups[g] or idx + 1 in groups[g])]
+        if not hits:
+            groups.append({idx: c})
+            heads.append(c)
+            continue
+        first = hits[0]
+        groups[first][idx] = c
+        for g in reversed(hits[1:]):
+            groups[first].update(groups.pop(g))
+            heads.pop(g)
+    out = []
+    for head, group in zip(heads, groups):
+        if len(group) <= 1:
+            out.append(head)
+            continue
+        parts = [group[i] for i in sorted(group)]
+        out.append(
+            RetrievedChunk(
+                doc_id=head.doc_id,
+                title=head.title,
+                score=max(p.score for p in parts),
+                source_path=head.source_path,
+                text="\n\n".join(p.text for p in parts),
+                lexical_score=max(p.lexical_score for p in parts),
+                rerank_score=head.rerank_score,
+                merged_ids=tuple(p.doc_id for p in parts),
+            )
+        )
+    return out
+
+
+def assemble_messages(
+    system: str,
+    history: List[Dict[str, str]],
+    user: str,
+    chunks: List[RetrievedChunk],
+    summary: str | None,
+    counter: TokenCounter,
+    max_tokens: int,
+    summary_max_tokens: int,
+    history_min_tokens: int,
+    dedup_threshold: float,
+) -> PromptPlan:
+    unique = dedup_chunks(chunks, dedup_threshold)
+    merged = merge_adjacent(unique)
+    plan = PromptPlan(messages=[], chunks=[], tokens={}, deduped=len(chunks) - len(unique), merged=len(unique) - len(merged))
+
+    turns = [m for m in history if m.get("role") in ("user", "assistant") and m.get("content")]
+    if turns and turns[-1] == {"role": "user", "content": user}:
+        turns = turns[:-1]
+
+    budget = int(max_tokens) - counter.message({"content": system}) - counter.message({"content": user})
+
+    if summary:
+        cap = min(int(summary_max_tokens), max(0, budget) // 3) - counter.count(SUMMARY_HEADER)
+        trimmed = counter.truncate(summary, cap)
+        if trimmed != summary:
+            plan.truncated.append("summary")
+        summary = trimmed
+        if summary:
+            budget -= counter.message({"content": SUMMARY_HEADER + summary})
+
+    history_tokens = sum(counter.message(m) for m in turns)
+    allowance = budget - min(int(history_min_tokens), history_tokens, max(0, budget) // 2) - counter.message({"content": CONTEXT_HEADER})
+    blocks = []
+    for c in merged:
+        block = _format_chunk(len(blocks) + 1, c)
+        cost = counter.count(block) + 2
+        if cost > allowance:
+            if blocks:
+                continue
+            head = counter.count(_format_chunk(1, RetrievedChunk(**{**c.__dict__, "text": ""})))
+            text = counter.truncate(c.text, allowance - head - 2)
+            if not text:
+                break
+            c = RetrievedChunk(**{**c.__dict__, "text": text})
+            block = _format_chunk(1, c)
+            cost = counter.count(block) + 2
+            plan.truncated.append("context")
+        blocks.append(block)
+        plan.chunks.append(c)
+        allowance -= cost
+    context = "\n\n".join(blocks).strip()
+    if context:
+        budget -= counter.message({"content": CONTEXT_HEADER + context})
+
+    kept: List[Dict[str, str]] = []
+    for m in reversed(turns):
+        cost = counter.message(m)
+        if cost > budget:
+            break
+        kept.append(m)
+        budget -= cost
+    kept.reverse()
+    plan.history_dropped = len(turns) - len(kept)
+
+    plan.messages = build_messages(system, kept, user, context, summary)
+    sizes = {"system": 0, "summary": 0, "history": 0, "context": 0, "user": 0}
+    last = len(plan.messages) - 1
+    for i, m in enumerate(plan.messages):
+        if i == 0:
+            part = "system"
+        elif i == last:
+            part = "user"
+        elif m["role"] != "system":
+            part = "history"
+        elif m["content"].startswith(SUMMARY_HEADER):
+            part = "summary"
+        else:
+            part = "context"
+        sizes[part] += counter.message(m)
+    sizes["total"] = sum(sizes.values())
+    plan.tokens = sizes
+    return plan
+
+
 def build_messages(system: str, history: List[Dict[str, str]], user: str, context: str, summary: str | None) -> List[Dict[str, str]]:
     msgs = [{"role": "system", "content": system}]
     if summary:
-        msgs.append({"role": "system", "content": f"Краткий контекст диалога:\n{summary}".strip()})
+        msgs.append({"role": "system", "content": f"{SUMMARY_HEADER}{summary}".strip()})
     for m in history:
         if m.get("role") in ("user", "assistant") and m.get("content"):
             msgs.append({"role": m["role"], "content": m["content"]})
     if context:
-        msgs.append({"role": "system", "content": f"Контекст из базы знаний:\n{context}".strip()})
+        msgs.append({"role": "system", "content": f"{CONTEXT_HEADER}{context}".strip()})
     msgs.append({"role": "user", "content": user})
     return msgs
 
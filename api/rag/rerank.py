@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import List, Optional
+
+from api.app.metrics import Metrics
+from api.rag.chunking import content_hash
+from api.rag.lru import LocalCache
+from api.rag.retriever import RetrievedChunk
+
+
+class CrossEncoderReranker:
+    def __init__(
+        self,
+        model: str,
+        batch_size: int = 16,
+        max_entries: int = 4096,
+        ttl_seconds: int = 3600,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.model_name = model
+        self.batch_size = max(1, int(batch_size))
+        self.cache = LocalCache(max_entries, ttl_seconds)
+        self.m = metrics
+        from sentence_transformers import CrossEncoder
+
+        self._model = CrossEncoder(model)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._slot = threading.BoundedSemaphore(1)
+
+    def _key(self, query: str, c: RetrievedChunk) -> tuple:
+        return (query, c.doc_id, content_hash(c.text))
+
+    def _score_in_slot(self, acquired: bool, queries: List[str], chunk_lists: List[List[RetrievedChunk]]) -> List[List[float]]:
+        if not acquired:
+            self._slot.acquire()
+        try:
+            return self.score_many(queries, chunk_lists)
+        finally:
+            self._slot.release()
+
+    def score(self, query: str, chunks: List[RetrievedChunk]) -> List[float]:
+        return self.score_many([query], [chunks])[0]
+
+    def score_many(self, queries: List[str], chunk_lists: List[List[RetrievedChunk]]) -> List[List[float]]:
+        scores: List[List[Optional[float]]] = [
+            [self.cache.get(self._key(q, c)) for c in chunks] for q, chunks in zip(queries, chunk_lists)
+        ]
+        todo = [(i, j) for i, row in enumerate(scores) for j, s in enumerate(row) if s is None]
+        if self.m:
+            self.m.inc("rerank_cache_hit", sum(len(row) for row in scores) - len(todo))
+            self.m.inc("rerank_cache_miss", len(todo))
+        if todo:
+            pairs = [(queries[i], chunk_lists[i][j].text) for i, j in todo]
+            out = self._model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+            for (i, j), s in zip(todo, out):
+                scores[i][j] = float(s)
+                self.cache.put(self._key(queries[i], chunk_lists[i][j]), float(s))
+        return [[float(s) for s in row] for row in scores]
+
+    async def rerank(
+        self,
+        query: str,
+        chunks: List[RetrievedChunk],
+        top_k: int,
+        budget_ms: Optional[float] = None,
+    ) -> Optional[List[RetrievedChunk]]:
+        out = await self.rerank_many([query], [chunks], [top_k], budget_ms=budget_ms)
+        return out[0] if out is not None else None
+
+    async def rerank_many(
+        self,
+        queries: List[str],
+        chunk_lists: List[List[RetrievedChunk]],
+        top_ks: List[int],
+        budget_ms: Optional[float] = None,
+    ) -> Optional[List[List[RetrievedChunk]]]:
+        total = sum(len(chunks) for chunks in chunk_lists)
+        if not total:
+            return [[] for _ in chunk_lists]
+        if budget_ms is not None and budget_ms <= 0:
+            return None
+        acquired = budget_ms is not None
+        if acquired and not self._slot.acquire(blocking=False):
+            self._count("rerank_busy")
+            return None
+        t0 = perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            fut = loop.run_in_executor(self._executor, self._score_in_slot, acquired, queries, chunk_lists)
+        except BaseException:
+            if acquired:
+                self._slot.release()
+            raise
+        try:
+            scores = await asyncio.wait_for(fut, timeout=budget_ms / 1000.0 if budget_ms is not None else None)
+        except asyncio.TimeoutError:
+            self._count("rerank_timeout")
+            return None
+        if self.m:
+            self.m.observe_ms("rerank_ms", (perf_counter() - t0) * 1000.0)
+            self.m.observe("rerank_candidates", total)
+        return [_ranked(chunks, row, k) for chunks, row, k in zip(chunk_lists, scores, top_ks)]
+
+    def _count(self, name: str) -> None:
+        if self.m:
+            self.m.inc(name)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _ranked(chunks: List[RetrievedChunk], scores: List[float], top_k: int) -> List[RetrievedChunk]:
+    out = []
+    for c, s in zip(chunks, scores):
+        x = RetrievedChunk(**c.__dict__)
+        x.rerank_score = s
+        out.append(x)
+    out.sort(key=lambda c: c.rerank_score, reverse=True)
+    return out[:top_k]
@@ -1,14 +1,24 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
+from time import perf_counter
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Sequence, Tuple, Union
+import asyncio
 import hashlib
-import json
-import time
 
-from api.stores.qdrant_store import QdrantStore
-from api.stores.redis_store import RedisConversationStore
-from api.rag.embeddings import EmbeddingClient
+from api.stores.base import VectorStore
+from api.stores.redis_store import AsyncRedisConversationStore
+from api.app.metrics import Metrics
+from api.app.tracing import span
+from api.rag.embeddings import Embedder
+from api.rag.lru import LocalCache
+from api.rag.lexical import LexicalIndex, LexicalIndexStore
+from api.stores.codec import decode_hits, decode_payload, encode_hits, encode_payload
+
+if TYPE_CHECKING:
+    from api.rag.rerank import CrossEncoderReranker
+
+QueryVector = Union[Sequence[float], "asyncio.Future[Sequence[float]]"]
 
 
 @dataclass
@@ -18,60 +28,405 @@ class RetrievedChunk:
     score: float
     source_path: str
     text: str
+    lexical_score: float = 0.0
+    rerank_score: Optional[float] = None
+    merged_ids: Tuple[str, ...] = ()
+
+
+def reciprocal_rank_fusion(runs: List[List[RetrievedChunk]], top_k: int, k: int = 60) -> List[RetrievedChunk]:
+    fused: Dict[str, float] = {}
+    best: Dict[str, RetrievedChunk] = {}
+    for run in runs:
+        for rank, c in enumerate(run, start=1):
+            fused[c.doc_id] = fused.get(c.doc_id, 0.0) + 1.0 / (k + rank)
+            prev = best.get(c.doc_id)
+            if prev is None:
+                best[c.doc_id] = RetrievedChunk(**c.__dict__)
+            elif c.lexical_score:
+                prev.lexical_score = max(prev.lexical_score, c.lexical_score)
+            else:
+                prev.score = c.score
+    order = sorted(fused, key=lambda d: fused[d], reverse=True)[:top_k]
+    return [best[d] for d in order]
+
+
+def _chunk(h: Dict[str, Any]) -> RetrievedChunk:
+    return RetrievedChunk(
+        doc_id=h["doc_id"],
+        title=h["title"],
+        score=float(h["score"]),
+        source_path=h["source_path"],
+        text=h["text"],
+    )
 
 
 class Retriever:
     def __init__(
         self,
-        qdrant: QdrantStore,
-        embedder: EmbeddingClient,
-        cache: RedisConversationStore,
+        qdrant: VectorStore,
+        embedder: Embedder,
+        cache: AsyncRedisConversationStore,
         cache_ttl_seconds: int,
         top_k: int,
+        l1: Optional[LocalCache] = None,
+        version_refresh_seconds: float = 5.0,
+        metrics: Optional[Metrics] = None,
+        lexical: Optional[LexicalIndexStore] = None,
+        mode: str = "dense",
+        hybrid_candidates: int = 20,
+        rrf_k: int = 60,
+        reranker: Optional["CrossEncoderReranker"] = None,
+        rerank_candidates: int = 20,
+        rerank_budget_ms: Optional[float] = None,
     ) -> None:
         self.qdrant = qdrant
         self.embedder = embedder
         self.cache = cache
         self.cache_ttl_seconds = int(cache_ttl_seconds)
         self.top_k = int(top_k)
+        self.l1 = l1
+        self.version_refresh_seconds = float(version_refresh_seconds)
+        self.m = metrics
+        self.lexical = lexical
+        self.mode = mode
+        self.hybrid_candidates = int(hybrid_candidates)
+        self.rrf_k = int(rrf_k)
+        self.reranker = reranker
+        self.rerank_candidates = int(rerank_candidates)
+        self.rerank_budget_ms = rerank_budget_ms
+
+    def _version_key(self) -> str:
+        return f"retr:{self.qdrant.collection}:version"
 
-    def _cache_key(self, query: str) -> str:
+    def _cache_key(self, query: str, k: int, version: int, mode: str) -> str:
         h = hashlib.sha256(query.encode("utf-8")).hexdigest()[:24]
-        return f"retr:{h}"
+        return f"retr:{self.qdrant.collection}:v{version}:{mode}:k{k}:{h}"
+
+    async def index_version(self) -> int:
+        lkey = ("version", self.qdrant.collection)
+        if self.l1 is not None:
+            v = self.l1.get(lkey)
+            if v is not None:
+                return v
+        raw = await self.cache.r.get(self._version_key())
+        v = int(raw) if raw else 0
+        if self.l1 is not None:
+            self.l1.put(lkey, v, ttl_seconds=self.version_refresh_seconds)
+        return v
+
+    async def bump_version(self) -> int:
+        v = int(await self.cache.r.incr(self._version_key()))
+        if self.l1 is not None:
+            self.l1.clear()
+            self.l1.put(("version", self.qdrant.collection), v, ttl_seconds=self.version_refresh_seconds)
+        if self.reranker is not None:
+            self.reranker.clear()
+        return v
+
+    def _count(self, name: str) -> None:
+        if self.m:
+            self.m.inc(name)
 
-    def retrieve(self, query: str, top_k: Optional[int] = None) -> List[RetrievedChunk]:
+    async def retrieve(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        vector: Optional[QueryVector] = None,
+        mode: Optional[str] = None,
+        use_cache: bool = True,
+        rerank: Optional[bool] = None,
+        prefetched: Optional[Dict[str, Optional[bytes]]] = None,
+        writes: Optional[List[Tuple[str, int, bytes]]] = None,
+    ) -> List[RetrievedChunk]:
+        with span("retrieve", timed=False):
+            return await self._retrieve(query, top_k, vector, mode, use_cache, rerank, prefetched, writes)
+
+    async def _retrieve(
+        self,
+        query: str,
+        top_k: Optional[int],
+        vector: Optional[QueryVector],
+        mode: Optional[str],
+        use_cache: bool,
+        rerank: Optional[bool],
+        prefetched: Optional[Dict[str, Optional[bytes]]],
+        writes: Optional[List[Tuple[str, int, bytes]]],
+    ) -> List[RetrievedChunk]:
+        t0 = perf_counter()
         k = int(top_k or self.top_k)
-        key = self._cache_key(query)
-
-        cached = self.cache.r.get(key)
-        if cached:
-            try:
-                payload = json.loads(cached)
-                out = [
-                    RetrievedChunk(
-                        doc_id=x["doc_id"],
-                        title=x["title"],
-                        score=float(x["score"]),
-                        source_path=x["source_path"],
-                        text=x["text"],
-                    )
-                    for x in payload
-                ]
-                return out[:k]
-            except Exception:
-                pass
-
-        vec = self.embedder.embed([query])[0]
-        hits = self.qdrant.search(vec, top_k=k)
-        out = [
-            RetrievedChunk(
-                doc_id=h["doc_id"],
-                title=h["title"],
-                score=float(h["score"]),
-                source_path=h["source_path"],
-                text=h["text"],
+        n = self._fetch_k(k, rerank)
+        candidates = await self._candidates(query, n, vector, mode, use_cache, prefetched, writes)
+        if self.reranker is None or rerank is False:
+            return candidates
+        budget = None
+        if self.rerank_budget_ms is not None:
+            budget = self.rerank_budget_ms - (perf_counter() - t0) * 1000.0
+        with span("rerank", timed=False, candidates=len(candidates)):
+            out = await self.reranker.rerank(query, candidates, k, budget_ms=budget)
+        if out is None:
+            self._count("rerank_skipped")
+            return candidates[:k]
+        return out
+
+    def _fetch_k(self, k: int, rerank: Optional[bool]) -> int:
+        if self.reranker is None or rerank is False:
+            return k
+        return max(k, self.rerank_candidates)
+
+    async def prefetch_key(self, query: str, top_k: Optional[int] = None, mode: Optional[str] = None) -> Optional[str]:
+        n = self._fetch_k(int(top_k or self.top_k), None)
+        key = self._cache_key(query, n, await self.index_version(), mode or self.mode)
+        if self.l1 is not None and self.l1.get(key) is not None:
+            return None
+        return key
+
+    async def _candidates(
+        self,
+        query: str,
+        k: int,
+        vector: Optional[QueryVector],
+        mode: Optional[str],
+        use_cache: bool,
+        prefetched: Optional[Dict[str, Optional[bytes]]] = None,
+        writes: Optional[List[Tuple[str, int, bytes]]] = None,
+    ) -> List[RetrievedChunk]:
+        mode = mode or self.mode
+        version = await self.index_version()
+        key = self._cache_key(query, k, version, mode)
+
+        if use_cache and self.l1 is not None:
+            hit = self.l1.get(key)
+            if hit is not None:
+                self._count("retr_cache_l1_hit")
+                return list(hit)
+            self._count("retr_cache_l1_miss")
+
+        if not use_cache:
+            cached = None
+        elif prefetched is not None and key in prefetched:
+            cached = prefetched[key]
+        else:
+            cached = await self.cache.rb.get(key)
+        out = await self._decode_cached(key, cached, version) if cached else None
+        if out is not None:
+            return list(out)
+        if use_cache:
+            self._count("retr_cache_l2_miss")
+
+        with span("search", mode=mode):
+            out = await self._search(query, k, vector, mode, version)
+        if use_cache:
+            fills = self._fills(key, version, out)
+            if writes is not None:
+                writes.extend(fills)
+            else:
+                await self._write(fills)
+            if self.l1 is not None:
+                self.l1.put(key, out)
+        return list(out)
+
+    async def retrieve_many(
+        self,
+        queries: List[str],
+        top_k: Optional[Union[int, Sequence[int]]] = None,
+        mode: Optional[str] = None,
+        use_cache: bool = True,
+        rerank: Optional[bool] = None,
+    ) -> List[List[RetrievedChunk]]:
+        with span("retrieve_many", queries=len(queries)):
+            return await self._retrieve_many(queries, top_k, mode, use_cache, rerank)
+
+    async def _retrieve_many(
+        self,
+        queries: List[str],
+        top_k: Optional[Union[int, Sequence[int]]],
+        mode: Optional[str],
+        use_cache: bool,
+        rerank: Optional[bool],
+    ) -> List[List[RetrievedChunk]]:
+        t0 = perf_counter()
+        mode = mode or self.mode
+        if top_k is None or isinstance(top_k, int):
+            ks = [int(top_k or self.top_k)] * len(queries)
+        else:
+            ks = [int(k or self.top_k) for k in top_k]
+        ns = [self._fetch_k(k, rerank) for k in ks]
+        version = await self.index_version()
+        keys = [self._cache_key(q, n, version, mode) for q, n in zip(queries, ns)]
+        out: List[Optional[List[RetrievedChunk]]] = [None] * len(queries)
+
+        if use_cache:
+            if self.l1 is not None:
+                for i, key in enumerate(keys):
+                    hit = self.l1.get(key)
+                    out[i] = list(hit) if hit is not None else None
+                    self._count("retr_cache_l1_hit" if hit is not None else "retr_cache_l1_miss")
+            missing = [i for i, x in enumerate(out) if x is None]
+            if missing:
+                raw = await self.cache.rb.mget([keys[i] for i in missing])
+                for i, cached in zip(missing, raw):
+                    found = await self._decode_cached(keys[i], cached, version) if cached else None
+                    if found is not None:
+                        out[i] = list(found)
+                    else:
+                        self._count("retr_cache_l2_miss")
+
+        todo = [i for i, x in enumerate(out) if x is None]
+        if todo:
+            with span("search", mode=mode, queries=len(todo)):
+                found = await self._search_many([queries[i] for i in todo], [ns[i] for i in todo], mode, version)
+            fills: List[Tuple[str, int, bytes]] = []
+            for i, chunks in zip(todo, found):
+                out[i] = list(chunks)
+                if use_cache:
+                    fills += self._fills(keys[i], version, chunks)
+                    if self.l1 is not None:
+                        self.l1.put(keys[i], chunks)
+            if fills:
+                await self._write(fills)
+
+        if self.reranker is None or rerank is False:
+            return out  # type: ignore[return-value]
+        budget = None
+        if self.rerank_budget_ms is not None:
+            budget = self.rerank_budget_ms - (perf_counter() - t0) * 1000.0
+        with span("rerank", timed=False, candidates=sum(len(c or ()) for c in out)):
+            ranked = await self.reranker.rerank_many(queries, [c or [] for c in out], ks, budget_ms=budget)
+        if ranked is None:
+            self._count("rerank_skipped")
+            return [(c or [])[:k] for c, k in zip(out, ks)]
+        return ranked
+
+    async def _decode_cached(self, key: str, cached: bytes, version: int) -> Optional[List[RetrievedChunk]]:
+        d0 = perf_counter()
+        with span("cache.l2_decode", timed=False):
+            hits = decode_hits(cached)
+            out = await self._resolve(hits, version) if hits is not None else None
+        if out is None:
+            return None
+        self._count("retr_cache_l2_hit")
+        if self.m:
+            self.m.observe_ms("retr_cache_decode_ms", (perf_counter() - d0) * 1000.0)
+        if self.l1 is not None:
+            self.l1.put(key, out)
+        return out
+
+    def _fills(self, key: str, version: int, out: List[RetrievedChunk]) -> List[Tuple[str, int, bytes]]:
+        fills = [(key, self.cache_ttl_seconds, encode_hits([(c.doc_id, c.score, c.lexical_score) for c in out]))]
+        if self._lexical_index(version) is None:
+            fills += [
+                (
+                    self._payload_key(version, c.doc_id),
+                    self.cache_ttl_seconds,
+                    encode_payload({"title": c.title, "source_path": c.source_path, "text": c.text}),
+                )
+                for c in out
+            ]
+        if self.m:
+            self.m.observe("retr_cache_entry_bytes", len(fills[0][2]))
+        return fills
+
+    async def _write(self, fills: List[Tuple[str, int, bytes]]) -> None:
+        async with self.cache.rb.pipeline() as pipe:
+            for key, ttl, value in fills:
+                pipe.setex(key, ttl, value)
+            await pipe.execute()
+
+    def _payload_key(self, version: int, doc_id: str) -> str:
+        return f"retr:{self.qdrant.collection}:v{version}:doc:{doc_id}"
+
+    def _lexical_index(self, version: int) -> Optional[LexicalIndex]:
+        return self.lexical.current(version) if self.lexical is not None else None
+
+    async def _resolve(self, hits: List[Tuple[str, float, float]], version: int) -> Optional[List[RetrievedChunk]]:
+        index = self._lexical_index(version)
+        out: List[Optional[RetrievedChunk]] = []
+        missing = []
+        for j, (doc_id, score, lexical_score) in enumerate(hits):
+            row = index.row(doc_id) if index is not None else None
+            if row is None:
+                out.append(None)
+                missing.append(j)
+                continue
+            meta = index.meta[row]
+            out.append(RetrievedChunk(doc_id, meta["title"], score, meta["source_path"], index.text(row), lexical_score))
+        if missing:
+            raw = await self.cache.rb.mget([self._payload_key(version, hits[j][0]) for j in missing])
+            for j, data in zip(missing, raw):
+                p = decode_payload(data) if data is not None else None
+                if p is None or not {"title", "source_path", "text"} <= p.keys():
+                    return None
+                doc_id, score, lexical_score = hits[j]
+                out[j] = RetrievedChunk(doc_id, p["title"], score, p["source_path"], p["text"], lexical_score)
+        return out
+
+    async def _search(
+        self,
+        query: str,
+        k: int,
+        vector: Optional[QueryVector],
+        mode: str,
+        version: int,
+    ) -> List[RetrievedChunk]:
+        index = self.lexical.current(version) if self.lexical is not None and mode != "dense" else None
+        if mode == "lexical":
+            if index is None:
+                self._count("retr_lexical_missing")
+                return []
+            return await asyncio.to_thread(self._lexical, index, query, k)
+        if index is None:
+            return await self._dense(query, k, vector)
+        n = max(k, self.hybrid_candidates)
+        dense, lexical = await asyncio.gather(
+            self._dense(query, n, vector),
+            asyncio.to_thread(self._lexical, index, query, n),
+        )
+        return reciprocal_rank_fusion([dense, lexical], top_k=k, k=self.rrf_k)
+
+    async def _search_many(self, queries: List[str], ks: List[int], mode: str, version: int) -> List[List[RetrievedChunk]]:
+        index = self.lexical.current(version) if self.lexical is not None and mode != "dense" else None
+        if mode == "lexical":
+            if index is None:
+                self._count("retr_lexical_missing")
+                return [[] for _ in queries]
+            return await asyncio.to_thread(lambda: [self._lexical(index, q, k) for q, k in zip(queries, ks)])
+        if index is None:
+            return await self._dense_many(queries, ks)
+        ns = [max(k, self.hybrid_candidates) for k in ks]
+        dense, lexical = await asyncio.gather(
+            self._dense_many(queries, ns),
+            asyncio.to_thread(lambda: [self._lexical(index, q, n) for q, n in zip(queries, ns)]),
+        )
+        return [reciprocal_rank_fusion([d, x], top_k=k, k=self.rrf_k) for d, x, k in zip(dense, lexical, ks)]
+
+    async def _dense(self, query: str, k: int, vector: Optional[QueryVector]) -> List[RetrievedChunk]:
+        vec = await asyncio.shield(vector) if isinstance(vector, asyncio.Future) else vector
+        if vec is None:
+            with span("embed"):
+                vec = (await self.embedder.aembed([query]))[0]
+        hits = await asyncio.to_thread(self.qdrant.search, vec, k)
+        return [_chunk(h) for h in hits]
+
+    async def _dense_many(self, queries: List[str], ks: List[int]) -> List[List[RetrievedChunk]]:
+        with span("embed", queries=len(queries)):
+            vectors = await self.embedder.aembed(list(queries))
+        batches = await asyncio.to_thread(self.qdrant.search_many, vectors, ks)
+        return [[_chunk(h) for h in hits] for hits in batches]
+
+    def _lexical(self, index: LexicalIndex, query: str, k: int) -> List[RetrievedChunk]:
+        out = []
+        with span("lexical.search"):
+            found = index.search(query, k)
+        for i, score in found:
+            meta = index.meta[i]
+            out.append(
+                RetrievedChunk(
+                    doc_id=meta["doc_id"],
+                    title=meta["title"],
+                    score=0.0,
+                    source_path=meta["source_path"],
+                    text=index.text(i),
+                    lexical_score=score,
+                )
             )
-            for h in hits
-        ]
-        self.cache.r.setex(key, self.cache_ttl_seconds, json.dumps([x.__dict__ for x in out], ensure_ascii=False))
-        return out
\ No newline at end of file
+        return out
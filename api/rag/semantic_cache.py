@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass
+class _Entry:
+    signature: str
+    vector: np.ndarray
+    answer: str
+    expires_at: float
+
+
+def source_signature(doc_ids: Iterable[str]) -> str:
+    raw = "\x1f".join(sorted(set(doc_ids)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+class SemanticCache:
+    def __init__(self, threshold: float, ttl_seconds: int, max_entries: int) -> None:
+        self.threshold = float(threshold)
+        self.ttl_seconds = int(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_sig: Dict[str, Dict[int, None]] = {}
+
+    def get(self, signature: str, vector: Sequence[float]) -> Optional[str]:
+        now = time.monotonic()
+        q = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            ids = list(self._by_sig.get(signature, ()))
+            live: List[int] = []
+            for i in ids:
+                if self._entries[i].expires_at <= now:
+                    self._drop(i)
+                else:
+                    live.append(i)
+            if not live:
+                return None
+            sims = np.stack([self._entries[i].vector for i in live]) @ q
+            best = int(np.argmax(sims))
+            if float(sims[best]) < self.threshold:
+                return None
+            self._entries.move_to_end(live[best])
+            return self._entries[live[best]].answer
+
+    def put(self, signature: str, vector: Sequence[float], answer: str) -> None:
+        entry = _Entry(
+            signature=signature,
+            vector=np.asarray(vector, dtype=np.float32),
+            answer=answer,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        with self._lock:
+            self._seq += 1
+            self._entries[self._seq] = entry
+            self._by_sig.setdefault(signature, {})[self._seq] = None
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_sig.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, i: int) -> None:
+        entry = self._entries.pop(i)
+        ids = self._by_sig.get(entry.signature)
+        if ids is not None:
+            ids.pop(i, None)
+            if not ids:
+                del self._by_sig[entry.signature]
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from time import perf_counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from api.app.metrics import Metrics
+from api.rag.llm import LLMClient
+from api.stores.redis_store import AsyncRedisConversationStore
+
+log = logging.getLogger("api")
+
+SYSTEM_SUMMARY = """Сожми диалог клиента с ассистентом в краткую сводку (до 8 пунктов).
+Сохрани: что нужно клиенту (сплав, толщина, ширина, объём, город, сроки), уже данные ответы, контакты и договорённости.
+Если есть предыдущая сводка, обнови её, не теряя фактов."""
+
+
+def summary_messages(previous: Optional[str], turns: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    lines = [f"{'Клиент' if t.get('role') == 'user' else 'Ассистент'}: {t.get('content', '')}" for t in turns]
+    body = "\n".join(lines)
+    if previous:
+        body = f"Предыдущая сводка:\n{previous}\n\nНовые реплики:\n{body}"
+    return [{"role": "system", "content": SYSTEM_SUMMARY}, {"role": "user", "content": body}]
+
+
+class ConversationSummarizer:
+    def __init__(
+        self,
+        store: AsyncRedisConversationStore,
+        llm: LLMClient,
+        metrics: Optional[Metrics] = None,
+        trigger_messages: int = 16,
+        keep_messages: int = 6,
+        queue_size: int = 256,
+        workers: int = 1,
+    ) -> None:
+        self.store = store
+        self.llm = llm
+        self.m = metrics
+        self.trigger_messages = max(2, int(trigger_messages))
+        self.keep_messages = max(0, min(int(keep_messages), self.trigger_messages - 1))
+        self.queue_size = max(1, int(queue_size))
+        self.workers = max(1, int(workers))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue[Tuple[str, float]]] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Set[str] = set()
+
+    def submit(self, conversation_id: str, history_len: int) -> bool:
+        if history_len < self.trigger_messages or conversation_id in self._pending:
+            return False
+        queue = self._ensure_workers()
+        try:
+            queue.put_nowait((conversation_id, perf_counter()))
+        except asyncio.QueueFull:
+            self._count("summary_dropped")
+            return False
+        self._pending.add(conversation_id)
+        if self.m:
+            self.m.observe("summary_queue_depth", queue.qsize())
+        return True
+
+    def _count(self, name: str) -> None:
+        if self.m:
+            self.m.inc(name)
+
+    def _ensure_workers(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or not self._tasks or all(t.done() for t in self._tasks):
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._pending.clear()
+            self._tasks = [loop.create_task(self._run(self._queue)) for _ in range(self.workers)]
+        return self._queue
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        while True:
+            conversation_id, enqueued_at = await queue.get()
+            try:
+                await self.summarize(conversation_id, enqueued_at)
+            except Exception as e:
+                self._count("summary_failed")
+                log.warning("summary_failed", extra={"extra": {"conversation_id": conversation_id, "error": str(e)}})
+            finally:
+                self._pending.discard(conversation_id)
+
+    async def summarize(self, conversation_id: str, enqueued_at: Optional[float] = None) -> bool:
+        t0 = perf_counter()
+        if self.m and enqueued_at is not None:
+            self.m.observe_ms("summary_queue_wait_ms", (t0 - enqueued_at) * 1000.0)
+        history, previous = await asyncio.gather(
+            self.store.history(conversation_id),
+            self.store.get_summary(conversation_id),
+        )
+        n = len(history) - self.keep_messages
+        if len(history) < self.trigger_messages or n <= 0 or not self.llm.s.llm_api_key:
+            return False
+        summary = await self.llm.complete(summary_messages(previous, history[:n]))
+        if not summary:
+            return False
+        await self.store.set_summary(conversation_id, summary)
+        await self.store.drop_oldest(conversation_id, n)
+        self._count("summary_written")
+        if self.m:
+            self.m.observe_ms("summary_ms", (perf_counter() - t0) * 1000.0)
+            if enqueued_at is not None:
+                self.m.observe_ms("summary_lag_ms", (perf_counter() - enqueued_at) * 1000.0)
+            self.m.observe("summary_messages_folded", n)
+        return True
+
+    async def aclose(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
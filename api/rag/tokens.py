@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import logging
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+log = logging.getLogger("api")
+
+WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+MESSAGE_OVERHEAD = 4
+
+
+def tokenizer_file(path: str) -> Path:
+    p = Path(path)
+    if p.suffix == ".json":
+        return p
+    return p.parent / "tokenizer.json" if p.suffix and not p.is_dir() else p / "tokenizer.json"
+
+
+class TokenCounter:
+    def __init__(self, path: Optional[str] = None, cache_size: int = 4096) -> None:
+        self.path = tokenizer_file(path) if path else None
+        self._tok = None
+        if self.path:
+            try:
+                from tokenizers import Tokenizer
+
+                self._tok = Tokenizer.from_file(str(self.path))
+            except Exception as e:
+                log.warning("tokenizer_fallback", extra={"extra": {"tokenizer": str(self.path), "error": str(e)}})
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._tok is not None:
+            return len(self._tok.encode(text, add_special_tokens=False).ids)
+        return sum(math.ceil(len(w) / 4) for w in WORD_RE.findall(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        if self._tok is not None:
+            enc = self._tok.encode(text, add_special_tokens=False)
+            return text[: enc.offsets[max_tokens - 1][1]].rstrip()
+        used = 0
+        for m in WORD_RE.finditer(text):
+            used += math.ceil(len(m.group()) / 4)
+            if used > max_tokens:
+                return text[: m.start()].rstrip()
+        return text
+
+    def message(self, msg: Dict[str, str]) -> int:
+        return self.count(msg.get("content") or "") + MESSAGE_OVERHEAD
+
+    def messages(self, msgs: List[Dict[str, str]]) -> int:
+        return sum(self.message(m) for m in msgs)
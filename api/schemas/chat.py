@@ -6,6 +6,7 @@ class ChatRequest(BaseModel):
     conversation_id: str = Field(min_length=1, max_length=128)
     message: str = Field(min_length=1, max_length=4000)
     metadata: Optional[Dict[str, Any]] = None
+    trace: bool = False
 
 
 class Source(BaseModel):
@@ -13,6 +14,7 @@ class Source(BaseModel):
     title: str
     score: float
     source_path: str
+    doc_ids: List[str] = []
 
 
 class ChatResponse(BaseModel):
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 
 class IngestRequest(BaseModel):
@@ -10,4 +10,35 @@ class IngestRequest(BaseModel):
 
 class IngestResponse(BaseModel):
     indexed_chunks: int
-    collection: str
\ No newline at end of file
+    collection: str
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+    skipped: int = 0
+    errors: int = 0
+    elapsed_ms: float = 0.0
+    chunks_per_sec: float = 0.0
+
+
+class IngestJob(BaseModel):
+    job_id: str
+    status: str
+    collection: str
+
+
+class IngestJobStatus(BaseModel):
+    job_id: str
+    status: str
+    collection: str
+    request: IngestRequest
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    files: int = 0
+    files_total: int = 0
+    chunks: int = 0
+    embedded: int = 0
+    upserted: int = 0
+    errors: List[str] = []
+    eta_seconds: Optional[float] = None
+    result: Optional[IngestResponse] = None
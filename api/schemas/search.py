@@ -10,4 +10,12 @@ class SearchRequest(BaseModel):
 
 class SearchResponse(BaseModel):
     query: str
-    results: List[Source]
\ No newline at end of file
+    results: List[Source]
+
+
+class SearchBatchRequest(BaseModel):
+    queries: List[SearchRequest] = Field(min_length=1, max_length=256)
+
+
+class SearchBatchResponse(BaseModel):
+    results: List[SearchResponse]
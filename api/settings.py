@@ -17,15 +17,32 @@ class Settings(BaseSettings):
 
     cors_origins: str = "http://localhost:3000"
 
+    metrics_window_seconds: Optional[float] = 60.0
+    tracing_exporter: str = "none"
+    tracing_service_name: str = "rag-assistant"
+
     redis_url: str = "redis://redis:6379/0"
     redis_ttl_seconds: int = 1209600
     chat_max_turns: int = 14
+    chat_speculative_retrieval: bool = True
+    redis_max_connections: int = 64
 
     qdrant_url: str = "http://qdrant:6333"
     qdrant_collection: str = "kb"
+    qdrant_keep_versions: int = 2
+    vector_store: str = "qdrant"
+    local_index_dir: str = "data/vectors"
+    local_index_quantize: bool = False
+    local_index_compact_ratio: float = 0.1
 
     embedding_provider: str = "sentence_transformers"
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    embedding_onnx_path: str = "models/minilm-onnx"
+    embedding_max_length: int = 256
+    embedding_threads: int = 0
+    embedding_workers: int = 1
+    embedding_batch_max_size: int = 32
+    embedding_batch_max_wait_ms: float = 5.0
 
     llm_provider: str = "openai_compatible"
     llm_base_url: Optional[str] = None
@@ -33,10 +50,60 @@ class Settings(BaseSettings):
     llm_model: str = "gpt-4o-mini"
     llm_timeout_seconds: int = 18
     llm_max_output_tokens: int = 320
+    llm_http2: bool = True
+    llm_max_connections: int = 32
+    llm_max_keepalive_connections: int = 16
+    llm_keepalive_expiry_seconds: float = 60.0
+    llm_max_concurrency: int = 16
+    llm_max_retries: int = 2
+    llm_retry_backoff_seconds: float = 0.5
 
     retriever_top_k: int = 6
     retriever_min_score: float = 0.28
     retriever_cache_ttl_seconds: int = 21600
+    retriever_mode: str = "hybrid"
+    retriever_hybrid_candidates: int = 20
+    retriever_rrf_k: int = 60
+    retriever_min_lexical_score: Optional[float] = 3.0
+    lexical_index_dir: str = "data/index"
+    rerank_enabled: bool = False
+    rerank_model: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    rerank_candidates: int = 20
+    rerank_batch_size: int = 16
+    rerank_budget_ms: Optional[float] = 250.0
+    rerank_cache_max_entries: int = 4096
+    rerank_cache_ttl_seconds: int = 3600
+    retriever_min_rerank_score: Optional[float] = None
+    summary_enabled: bool = True
+    summary_trigger_messages: int = 16
+    summary_keep_messages: int = 6
+    summary_queue_size: int = 256
+    summary_workers: int = 1
+    prompt_tokenizer: Optional[str] = None
+    prompt_max_input_tokens: int = 3000
+    prompt_summary_max_tokens: int = 400
+    prompt_history_min_tokens: int = 400
+    prompt_dedup_threshold: float = 0.8
+    retriever_l1_max_entries: int = 1024
+    retriever_l1_ttl_seconds: int = 300
+    retriever_version_refresh_seconds: float = 5.0
+
+    ingest_embed_batch_size: int = 64
+    ingest_upsert_batch_size: int = 256
+    ingest_workers: int = 1
+    ingest_parallel_min_files: int = 256
+    ingest_parallel_min_bytes: int = 4194304
+    ingest_validate_samples: int = 3
+    ingest_job_ttl_seconds: int = 604800
+    ingest_lock_timeout_seconds: int = 600
+
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.92
+    semantic_cache_ttl_seconds: int = 3600
+    semantic_cache_max_entries: int = 2048
+
+    intent_model_path: str = "reports/intent_model.joblib"
+    intent_cache_max_entries: int = 4096
 
     rate_limit_rpm: int = 120
 
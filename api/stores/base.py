@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Protocol, Sequence, Tuple
+
+
+@dataclass
+class VectorPoint:
+    id: str
+    vector: Sequence[float]
+    payload: Dict[str, Any]
+
+
+def hit(point_id: str, score: float, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(point_id),
+        "score": float(score),
+        "doc_id": str(payload.get("doc_id", "")),
+        "title": str(payload.get("title", "")),
+        "source_path": str(payload.get("source_path", "")),
+        "text": str(payload.get("text", "")),
+    }
+
+
+class VectorStore(Protocol):
+    collection: str
+
+    def current(self) -> Optional[str]: ...
+
+    def versions(self) -> List[Tuple[int, str]]: ...
+
+    def create_version(self, vector_size: int) -> str: ...
+
+    def swap(self, target: str) -> None: ...
+
+    def drop(self, collection: str) -> None: ...
+
+    def drop_old_versions(self, keep: int) -> List[str]: ...
+
+    def count(self, collection: Optional[str] = None) -> int: ...
+
+    def upsert(self, points: List[VectorPoint], collection: Optional[str] = None) -> None: ...
+
+    def delete(self, ids: List[str], collection: Optional[str] = None) -> None: ...
+
+    def flush(self, collection: Optional[str] = None) -> None: ...
+
+    def scroll(self, collection: Optional[str] = None, batch_size: int = 1024) -> Iterator[Tuple[str, Dict[str, Any]]]: ...
+
+    def search(self, vector: Sequence[float], top_k: int, collection: Optional[str] = None) -> List[Dict[str, Any]]: ...
+
+    def search_many(
+        self, vectors: Sequence[Sequence[float]], top_k: Sequence[int], collection: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]: ...
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import json
+import struct
+from typing import Dict, List, Optional, Tuple, Union
+
+HITS_MAGIC = 0xB1
+_HEAD = struct.Struct("<BH")
+_HIT = struct.Struct("<Hff")
+
+ROLES = {"user": b"u", "assistant": b"a", "system": b"s"}
+ROLE_NAMES = {v[0]: k for k, v in ROLES.items()}
+
+
+def encode_hits(hits: List[Tuple[str, float, float]]) -> bytes:
+    parts = [_HEAD.pack(HITS_MAGIC, len(hits))]
+    for doc_id, score, lexical_score in hits:
+        raw = doc_id.encode("utf-8")
+        parts.append(_HIT.pack(len(raw), score, lexical_score))
+        parts.append(raw)
+    return b"".join(parts)
+
+
+def decode_hits(data: bytes) -> Optional[List[Tuple[str, float, float]]]:
+    if len(data) < _HEAD.size or data[0] != HITS_MAGIC:
+        return None
+    try:
+        _, n = _HEAD.unpack_from(data, 0)
+        pos = _HEAD.size
+        out = []
+        for _ in range(n):
+            size, score, lexical_score = _HIT.unpack_from(data, pos)
+            pos += _HIT.size
+            if pos + size > len(data):
+                return None
+            out.append((data[pos : pos + size].decode("utf-8"), score, lexical_score))
+            pos += size
+    except (struct.error, UnicodeDecodeError):
+        return None
+    return out if pos == len(data) else None
+
+
+def encode_turn(role: str, content: str) -> bytes:
+    return ROLES.get(role, b"s") + content.encode("utf-8")
+
+
+def decode_turn(data: Union[bytes, str]) -> Optional[Dict[str, str]]:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if not data:
+        return None
+    if data[:1] == b"{":
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+    role = ROLE_NAMES.get(data[0])
+    if role is None:
+        return None
+    return {"role": role, "content": data[1:].decode("utf-8", errors="replace")}
+
+
+def encode_payload(payload: Dict[str, str]) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_payload(data: bytes) -> Optional[Dict[str, str]]:
+    try:
+        p = json.loads(data)
+    except ValueError:
+        return None
+    return p if isinstance(p, dict) else None
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import time
+import uuid
+from typing import Any, Optional
+
+import redis.asyncio as aioredis
+
+from api.schemas.ingest import IngestJobStatus, IngestRequest
+
+
+class IngestJobStore:
+    def __init__(self, r: aioredis.Redis, ttl_seconds: int) -> None:
+        self.r = r
+        self.ttl_seconds = int(ttl_seconds)
+
+    def _key(self, job_id: str) -> str:
+        return f"ingest:job:{job_id}"
+
+    def _queue_key(self) -> str:
+        return "ingest:jobs"
+
+    def lock_name(self, collection: str) -> str:
+        return f"ingest:{collection}:lock"
+
+    async def create(self, req: IngestRequest, collection: str, enqueue: bool = True) -> IngestJobStatus:
+        job = IngestJobStatus(
+            job_id=uuid.uuid4().hex,
+            status="queued",
+            collection=collection,
+            request=req,
+            created_at=time.time(),
+        )
+        async with self.r.pipeline() as pipe:
+            pipe.setex(self._key(job.job_id), self.ttl_seconds, job.model_dump_json())
+            if enqueue:
+                pipe.rpush(self._queue_key(), job.job_id)
+            await pipe.execute()
+        return job
+
+    async def get(self, job_id: str) -> Optional[IngestJobStatus]:
+        raw = await self.r.get(self._key(job_id))
+        if not raw:
+            return None
+        return IngestJobStatus.model_validate_json(raw)
+
+    async def save(self, job: IngestJobStatus) -> None:
+        await self.r.setex(self._key(job.job_id), self.ttl_seconds, job.model_dump_json())
+
+    async def update(self, job: IngestJobStatus, **fields: Any) -> IngestJobStatus:
+        job = job.model_copy(update=fields)
+        await self.save(job)
+        return job
+
+    async def next(self, timeout_seconds: int) -> Optional[IngestJobStatus]:
+        item = await self.r.blpop([self._queue_key()], timeout=timeout_seconds)
+        if not item:
+            return None
+        return await self.get(item[1])
@@ -0,0 +1,395 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from api.app.tracing import span
+from api.stores.base import VectorPoint, hit
+
+
+BLOCK_ROWS = 65536
+COMPACT_MIN_ROWS = 1024
+
+
+@dataclass
+class _Segment:
+    name: str
+    dim: int
+    ids: List[str]
+    vectors: np.ndarray
+    scales: Optional[np.ndarray]
+    payload: np.ndarray
+    payload_offsets: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @cached_property
+    def index(self) -> Dict[str, int]:
+        return {pid: i for i, pid in enumerate(self.ids)}
+
+    def raw_payload(self, i: int) -> bytes:
+        lo, hi = int(self.payload_offsets[i]), int(self.payload_offsets[i + 1])
+        return bytes(self.payload[lo:hi])
+
+    def payload_at(self, i: int) -> Dict[str, Any]:
+        return json.loads(self.raw_payload(i).decode("utf-8"))
+
+    def vector_at(self, i: int) -> np.ndarray:
+        v = np.asarray(self.vectors[i], dtype=np.float32)
+        return v * self.scales[i] if self.scales is not None else v
+
+    def matrix(self, rows: np.ndarray) -> np.ndarray:
+        m = np.asarray(self.vectors[rows], dtype=np.float32)
+        return m * self.scales[rows, None] if self.scales is not None else m
+
+
+@dataclass
+class _View:
+    name: str
+    base: _Segment
+    delta: Optional[_Segment]
+    tombstones: List[str]
+    dead: Optional[np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.base) - (int(self.dead.sum()) if self.dead is not None else 0) + (len(self.delta) if self.delta is not None else 0)
+
+    def parts(self) -> List[Tuple[_Segment, Optional[np.ndarray]]]:
+        return [(self.base, self.dead)] + ([(self.delta, None)] if self.delta is not None else [])
+
+    def row(self, i: int) -> Tuple[_Segment, int]:
+        return (self.base, i) if i < len(self.base) else (self.delta, i - len(self.base))
+
+    def live(self) -> Iterator[Tuple[_Segment, int]]:
+        for seg, dead in self.parts():
+            for i in range(len(seg)):
+                if dead is None or not dead[i]:
+                    yield seg, i
+
+
+@dataclass
+class _Stage:
+    dim: int
+    gen: Optional[str]
+    base: Optional[_Segment]
+    rows: "OrderedDict[str, Tuple[np.ndarray, bytes]]"
+    tombstones: Set[str]
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _normalize(v: Sequence[float]) -> np.ndarray:
+    x = np.asarray(v, dtype=np.float32)
+    n = float(np.linalg.norm(x))
+    return x / n if n > 0 else x
+
+
+class LocalVectorStore:
+    def __init__(self, root: str, collection: str, quantize: bool = False, compact_ratio: float = 0.1) -> None:
+        self.root = Path(root)
+        self.collection = collection
+        self.quantize = bool(quantize)
+        self.compact_ratio = max(0.0, float(compact_ratio))
+        self._lock = threading.RLock()
+        self._staging: Dict[str, _Stage] = {}
+        self._readers: Dict[str, _View] = {}
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _alias_file(self) -> Path:
+        return self.root / f"{self.collection}.alias"
+
+    def _dir(self, name: str) -> Path:
+        return self.root / name
+
+    def _resolve(self, collection: Optional[str]) -> str:
+        if collection and collection != self.collection:
+            return collection
+        target = self.current()
+        if target is None:
+            raise KeyError(f"collection {self.collection} does not exist")
+        return target
+
+    def current(self) -> Optional[str]:
+        try:
+            return self._alias_file().read_text(encoding="utf-8").strip() or None
+        except OSError:
+            pass
+        if (self._dir(self.collection) / "CURRENT").exists():
+            return self.collection
+        return None
+
+    def versions(self) -> List[Tuple[int, str]]:
+        pat = re.compile(rf"^{re.escape(self.collection)}_v(\d+)$")
+        out = []
+        for d in self.root.iterdir():
+            m = pat.match(d.name)
+            if m and d.is_dir():
+                out.append((int(m.group(1)), d.name))
+        return sorted(out)
+
+    def create_version(self, vector_size: int) -> str:
+        with self._lock:
+            versions = self.versions()
+            n = versions[-1][0] + 1 if versions else 1
+            name = f"{self.collection}_v{n}"
+            self._dir(name).mkdir(parents=True, exist_ok=False)
+            self._staging[name] = _Stage(int(vector_size), None, None, OrderedDict(), set())
+            self._write(name)
+            return name
+
+    def swap(self, target: str) -> None:
+        self.compact(target)
+        legacy = self._dir(self.collection)
+        migrate = not self._alias_file().exists() and legacy.is_dir()
+        _write_atomic(self._alias_file(), target)
+        if migrate:
+            with self._lock:
+                self._readers.pop(self.collection, None)
+            shutil.rmtree(legacy, ignore_errors=True)
+
+    def drop(self, collection: str) -> None:
+        with self._lock:
+            self._staging.pop(collection, None)
+            self._readers.pop(collection, None)
+            shutil.rmtree(self._dir(collection), ignore_errors=True)
+
+    def drop_old_versions(self, keep: int) -> List[str]:
+        live = self.current()
+        old = [name for _, name in self.versions() if name != live]
+        dropped = old[: max(0, len(old) - max(0, int(keep) - 1))]
+        for name in dropped:
+            self.drop(name)
+        return dropped
+
+    def count(self, collection: Optional[str] = None) -> int:
+        name = self._resolve(collection)
+        self.flush(name)
+        return len(self._view(name))
+
+    def upsert(self, points: List[VectorPoint], collection: Optional[str] = None) -> None:
+        name = self._resolve(collection)
+        with self._lock:
+            st = self._stage(name)
+            for p in points:
+                pid = str(p.id)
+                payload = json.dumps(p.payload, ensure_ascii=False).encode("utf-8")
+                st.rows[pid] = (_normalize(p.vector), payload)
+                if st.base is not None and pid in st.base.index:
+                    st.tombstones.add(pid)
+
+    def delete(self, ids: List[str], collection: Optional[str] = None) -> None:
+        name = self._resolve(collection)
+        with self._lock:
+            st = self._stage(name)
+            for i in ids:
+                pid = str(i)
+                st.rows.pop(pid, None)
+                if st.base is not None and pid in st.base.index:
+                    st.tombstones.add(pid)
+
+    def flush(self, collection: Optional[str] = None) -> None:
+        name = self._resolve(collection)
+        with self._lock:
+            if name in self._staging:
+                self._write(name)
+                del self._staging[name]
+
+    def compact(self, collection: Optional[str] = None) -> None:
+        name = self._resolve(collection)
+        with self._lock:
+            st = self._stage(name)
+            if st.rows or st.tombstones:
+                self._write(name, compact=True)
+            del self._staging[name]
+
+    def scroll(self, collection: Optional[str] = None, batch_size: int = 1024) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        name = self._resolve(collection)
+        self.flush(name)
+        for seg, i in self._view(name).live():
+            yield seg.ids[i], seg.payload_at(i)
+
+    def search(self, vector: Sequence[float], top_k: int, collection: Optional[str] = None) -> List[Dict[str, Any]]:
+        with span("local.search", top_k=top_k):
+            return self._search([vector], [top_k], collection)[0]
+
+    def search_many(
+        self, vectors: Sequence[Sequence[float]], top_k: Sequence[int], collection: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        with span("local.search_many", queries=len(vectors)):
+            return self._search(vectors, top_k, collection)
+
+    def _search(
+        self, vectors: Sequence[Sequence[float]], top_k: Sequence[int], collection: Optional[str]
+    ) -> List[List[Dict[str, Any]]]:
+        view = self._view(self._resolve(collection))
+        n = len(view)
+        ks = [min(max(int(k), 0), n) for k in top_k]
+        kmax = max(ks, default=0)
+        if not n or kmax <= 0:
+            return [[] for _ in ks]
+        q = np.asarray(vectors, dtype=np.float32).reshape(len(ks), -1)
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        qt = np.ascontiguousarray((q / np.where(norms > 0, norms, 1.0)).T)
+        cand_idx, cand_score = [], []
+        offset = 0
+        for seg, dead in view.parts():
+            for lo in range(0, len(seg), BLOCK_ROWS):
+                hi = min(len(seg), lo + BLOCK_ROWS)
+                if seg.scales is None:
+                    scores = seg.vectors[lo:hi] @ qt
+                else:
+                    scores = (seg.vectors[lo:hi].astype(np.float32) @ qt) * seg.scales[lo:hi, None]
+                if dead is not None:
+                    scores[dead[lo:hi]] = -np.inf
+                if scores.shape[0] > kmax:
+                    part = np.argpartition(-scores, kmax - 1, axis=0)[:kmax]
+                    cand_score.append(np.take_along_axis(scores, part, axis=0))
+                else:
+                    part = np.broadcast_to(np.arange(scores.shape[0])[:, None], scores.shape)
+                    cand_score.append(scores)
+                cand_idx.append(part + lo + offset)
+            offset += len(seg)
+        idx = np.concatenate(cand_idx)
+        scores = np.concatenate(cand_score)
+        out = []
+        for j, k in enumerate(ks):
+            col_idx, col_score = idx[:, j], scores[:, j]
+            if col_idx.shape[0] > k:
+                part = np.argpartition(-col_score, k - 1)[:k] if k else np.arange(0)
+                col_idx, col_score = col_idx[part], col_score[part]
+            hits = []
+            for t in np.argsort(-col_score):
+                if not np.isfinite(col_score[t]):
+                    break
+                seg, i = view.row(int(col_idx[t]))
+                hits.append(hit(seg.ids[i], float(col_score[t]), seg.payload_at(i)))
+            out.append(hits)
+        return out
+
+    def _stage(self, name: str) -> _Stage:
+        if name not in self._staging:
+            view = self._view(name)
+            rows: "OrderedDict[str, Tuple[np.ndarray, bytes]]" = OrderedDict()
+            if view.delta is not None:
+                for i, pid in enumerate(view.delta.ids):
+                    rows[pid] = (view.delta.vector_at(i), view.delta.raw_payload(i))
+            gen = view.name.split("/")[1]
+            self._staging[name] = _Stage(view.base.dim, gen, view.base, rows, set(view.tombstones))
+        return self._staging[name]
+
+    def _write(self, name: str, compact: bool = False) -> None:
+        st = self._staging[name]
+        base = self._dir(name)
+        limit = max(COMPACT_MIN_ROWS, self.compact_ratio * len(st.base)) if st.base is not None else 0
+        if st.base is not None and not compact and len(st.rows) + len(st.tombstones) <= limit:
+            gen_dir = base / st.gen
+            deltas = sorted(d.name for d in gen_dir.iterdir() if d.is_dir() and d.name.startswith("delta-"))
+            delta = f"delta-{int(deltas[-1][6:]) + 1 if deltas else 1:06d}"
+            self._save(gen_dir / delta, st.dim, st.rows)
+            (gen_dir / delta / "tombstones.json").write_text(json.dumps(sorted(st.tombstones)), encoding="utf-8")
+            _write_atomic(base / "CURRENT", f"{st.gen}/{delta}")
+            for d in deltas[:-1]:
+                shutil.rmtree(gen_dir / d, ignore_errors=True)
+            return
+        rows = st.rows
+        if st.base is not None and len(st.base):
+            keep = np.array([pid not in st.tombstones for pid in st.base.ids], dtype=bool)
+            live = np.flatnonzero(keep)
+            rows = OrderedDict(
+                (st.base.ids[i], (v, st.base.raw_payload(i))) for i, v in zip(live.tolist(), st.base.matrix(live))
+            )
+            rows.update(st.rows)
+        gens = sorted(d.name for d in base.iterdir() if d.is_dir() and d.name.startswith("gen-"))
+        gen = f"gen-{int(gens[-1][4:]) + 1 if gens else 1:06d}"
+        self._save(base / gen, st.dim, rows)
+        _write_atomic(base / "CURRENT", gen)
+        for g in gens[:-1]:
+            shutil.rmtree(base / g, ignore_errors=True)
+
+    def _save(self, out: Path, dim: int, rows: "OrderedDict[str, Tuple[np.ndarray, bytes]]") -> None:
+        out.mkdir()
+        ids = list(rows.keys())
+        mat = np.stack([v for v, _ in rows.values()]).astype(np.float32) if rows else np.zeros((0, dim), dtype=np.float32)
+        if self.quantize:
+            scales = np.abs(mat).max(axis=1) / 127.0 if len(mat) else np.zeros(0, dtype=np.float32)
+            safe = np.where(scales > 0, scales, 1.0)
+            q = np.clip(np.rint(mat / safe[:, None]), -127, 127).astype(np.int8)
+            np.save(out / "vectors_i8.npy", q)
+            np.save(out / "scales.npy", scales.astype(np.float32))
+        else:
+            np.save(out / "vectors.npy", mat)
+        offsets = [0]
+        with open(out / "payload.bin", "wb") as f:
+            for _, payload in rows.values():
+                f.write(payload)
+                offsets.append(offsets[-1] + len(payload))
+        np.save(out / "payload_offsets.npy", np.array(offsets, dtype=np.int64))
+        (out / "ids.json").write_text(json.dumps(ids), encoding="utf-8")
+        (out / "meta.json").write_text(json.dumps({"dim": dim, "count": len(ids), "quantized": self.quantize}), encoding="utf-8")
+
+    def _view(self, name: str) -> _View:
+        base = self._dir(name)
+        pointer = (base / "CURRENT").read_text(encoding="utf-8").strip()
+        while True:
+            try:
+                return self._open(name, pointer)
+            except OSError:
+                latest = (base / "CURRENT").read_text(encoding="utf-8").strip()
+                if latest == pointer:
+                    raise
+                pointer = latest
+
+    def _open(self, name: str, pointer: str) -> _View:
+        key = f"{name}/{pointer}"
+        gen, _, delta = pointer.partition("/")
+        with self._lock:
+            view = self._readers.get(name)
+            if view is not None and view.name == key:
+                return view
+            d = self._dir(name) / gen
+            seg = view.base if view is not None and view.base.name == f"{name}/{gen}" else _load(f"{name}/{gen}", d)
+            if delta:
+                tombstones = json.loads((d / delta / "tombstones.json").read_text(encoding="utf-8"))
+                dead = np.zeros(len(seg), dtype=bool)
+                dead[[seg.index[t] for t in tombstones if t in seg.index]] = True
+                view = _View(key, seg, _load(key, d / delta), tombstones, dead)
+            else:
+                view = _View(key, seg, None, [], None)
+            self._readers[name] = view
+            return view
+
+
+def _load(key: str, d: Path) -> _Segment:
+    meta = json.loads((d / "meta.json").read_text(encoding="utf-8"))
+    if meta.get("quantized"):
+        vectors = np.load(d / "vectors_i8.npy", mmap_mode="r")
+        scales = np.load(d / "scales.npy")
+    else:
+        vectors = np.load(d / "vectors.npy", mmap_mode="r")
+        scales = None
+    payload_path = d / "payload.bin"
+    payload = np.memmap(payload_path, dtype=np.uint8, mode="r") if payload_path.stat().st_size else np.zeros(0, dtype=np.uint8)
+    return _Segment(
+        name=key,
+        dim=int(meta["dim"]),
+        ids=json.loads((d / "ids.json").read_text(encoding="utf-8")),
+        vectors=vectors,
+        scales=scales,
+        payload=payload,
+        payload_offsets=np.load(d / "payload_offsets.npy"),
+    )
@@ -1,8 +1,21 @@
 from __future__ import annotations
 
-from typing import List, Dict, Any, Optional
+import re
+from typing import Callable, List, Dict, Any, Iterator, Optional, Sequence, Tuple, TypeVar
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qm
+from qdrant_client.http.exceptions import UnexpectedResponse
+
+from api.app.tracing import span
+from api.stores.base import VectorPoint, hit
+
+T = TypeVar("T")
+
+
+def _missing(e: Exception) -> bool:
+    if isinstance(e, UnexpectedResponse):
+        return e.status_code == 404
+    return isinstance(e, ValueError) and "not found" in str(e)
 
 
 class QdrantStore:
@@ -10,38 +23,127 @@ class QdrantStore:
         self.client = QdrantClient(url=url)
         self.collection = collection
 
-    def ensure_collection(self, vector_size: int, recreate: bool) -> None:
-        exists = self.client.collection_exists(self.collection)
-        if exists and not recreate:
-            return
-        if exists and recreate:
-            self.client.delete_collection(self.collection)
+    def _alias_target(self) -> Optional[str]:
+        for a in self.client.get_aliases().aliases:
+            if a.alias_name == self.collection:
+                return a.collection_name
+        return None
+
+    def current(self) -> Optional[str]:
+        target = self._alias_target()
+        if target is None and self.client.collection_exists(self.collection):
+            return self.collection
+        return target
+
+    def versions(self) -> List[Tuple[int, str]]:
+        pat = re.compile(rf"^{re.escape(self.collection)}_v(\d+)$")
+        out = []
+        for c in self.client.get_collections().collections:
+            m = pat.match(c.name)
+            if m:
+                out.append((int(m.group(1)), c.name))
+        return sorted(out)
+
+    def create_version(self, vector_size: int) -> str:
+        versions = self.versions()
+        n = versions[-1][0] + 1 if versions else 1
+        name = f"{self.collection}_v{n}"
         self.client.create_collection(
-            collection_name=self.collection,
+            collection_name=name,
             vectors_config=qm.VectorParams(size=vector_size, distance=qm.Distance.COSINE),
         )
+        return name
+
+    def _read(self, collection: Optional[str], fn: Callable[[str], T]) -> T:
+        try:
+            return fn(collection or self.collection)
+        except (UnexpectedResponse, ValueError) as e:
+            if collection is not None or not _missing(e):
+                raise
+            versions = self.versions()
+            fallback = self._alias_target() or (versions[-1][1] if versions else None)
+            if fallback is None:
+                raise
+            return fn(fallback)
+
+    def swap(self, target: str) -> None:
+        ops: List[Any] = []
+        if self._alias_target() is not None:
+            ops.append(qm.DeleteAliasOperation(delete_alias=qm.DeleteAlias(alias_name=self.collection)))
+        elif self.client.collection_exists(self.collection):
+            self.client.delete_collection(self.collection)
+        ops.append(qm.CreateAliasOperation(create_alias=qm.CreateAlias(collection_name=target, alias_name=self.collection)))
+        self.client.update_collection_aliases(change_aliases_operations=ops)
+
+    def drop(self, collection: str) -> None:
+        self.client.delete_collection(collection)
+
+    def drop_old_versions(self, keep: int) -> List[str]:
+        live = self.current()
+        old = [name for _, name in self.versions() if name != live]
+        dropped = old[: max(0, len(old) - max(0, int(keep) - 1))]
+        for name in dropped:
+            self.client.delete_collection(name)
+        return dropped
 
-    def upsert(self, points: List[qm.PointStruct]) -> None:
-        self.client.upsert(collection_name=self.collection, points=points, wait=True)
+    def count(self, collection: Optional[str] = None) -> int:
+        return int(self.client.count(collection_name=collection or self.collection, exact=True).count)
 
-    def search(self, vector: List[float], top_k: int) -> List[Dict[str, Any]]:
-        hits = self.client.search(
-            collection_name=self.collection,
-            query_vector=vector,
-            limit=top_k,
-            with_payload=True,
-            with_vectors=False,
+    def upsert(self, points: List[VectorPoint], collection: Optional[str] = None) -> None:
+        self.client.upsert(
+            collection_name=collection or self.collection,
+            points=[qm.PointStruct(id=p.id, vector=[float(x) for x in p.vector], payload=p.payload) for p in points],
+            wait=True,
         )
-        out = []
-        for h in hits:
-            payload = h.payload or {}
-            out.append(
-                {
-                    "score": float(h.score),
-                    "doc_id": str(payload.get("doc_id", "")),
-                    "title": str(payload.get("title", "")),
-                    "source_path": str(payload.get("source_path", "")),
-                    "text": str(payload.get("text", "")),
-                }
+
+    def delete(self, ids: List[str], collection: Optional[str] = None) -> None:
+        self.client.delete(
+            collection_name=collection or self.collection,
+            points_selector=qm.PointIdsList(points=ids),
+            wait=True,
+        )
+
+    def flush(self, collection: Optional[str] = None) -> None:
+        return None
+
+    def scroll(self, collection: Optional[str] = None, batch_size: int = 1024) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection or self.collection,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
             )
-        return out
\ No newline at end of file
+            for pt in points:
+                yield str(pt.id), dict(pt.payload or {})
+            if offset is None:
+                return
+
+    def search(self, vector: Sequence[float], top_k: int, collection: Optional[str] = None) -> List[Dict[str, Any]]:
+        with span("qdrant.search", top_k=top_k):
+            hits = self._read(
+                collection,
+                lambda name: self.client.search(
+                    collection_name=name,
+                    query_vector=vector,
+                    limit=top_k,
+                    with_payload=True,
+                    with_vectors=False,
+                ),
+            )
+        return [hit(h.id, h.score, h.payload or {}) for h in hits]
+
+    def search_many(
+        self, vectors: Sequence[Sequence[float]], top_k: Sequence[int], collection: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        if not len(vectors):
+            return []
+        with span("qdrant.search_batch", queries=len(vectors)):
+            requests = [
+                qm.SearchRequest(vector=[float(x) for x in v], limit=int(k), with_payload=True, with_vector=False)
+                for v, k in zip(vectors, top_k)
+            ]
+            batches = self._read(collection, lambda name: self.client.search_batch(collection_name=name, requests=requests))
+        return [[hit(h.id, h.score, h.payload or {}) for h in hits] for hits in batches]
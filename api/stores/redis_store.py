@@ -1,8 +1,14 @@
 from __future__ import annotations
 
-import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
 import redis
+import redis.asyncio as aioredis
+
+from api.stores.codec import decode_turn, encode_turn
+
+
+def _decode(xs: List[Union[bytes, str]]) -> List[Dict[str, str]]:
+    return [t for t in map(decode_turn, xs) if t is not None]
 
 
 class RedisConversationStore:
@@ -19,23 +25,15 @@ class RedisConversationStore:
 
     def append(self, conversation_id: str, role: str, content: str) -> None:
         key = self._key(conversation_id)
-        item = json.dumps({"role": role, "content": content}, ensure_ascii=False)
         pipe = self.r.pipeline()
-        pipe.rpush(key, item)
+        pipe.rpush(key, encode_turn(role, content))
         pipe.ltrim(key, -self.max_turns * 2, -1)
         pipe.expire(key, self.ttl_seconds)
         pipe.execute()
 
     def history(self, conversation_id: str) -> List[Dict[str, str]]:
         key = self._key(conversation_id)
-        xs = self.r.lrange(key, 0, -1) or []
-        out = []
-        for x in xs:
-            try:
-                out.append(json.loads(x))
-            except Exception:
-                continue
-        return out
+        return _decode(self.r.lrange(key, 0, -1) or [])
 
     def set_summary(self, conversation_id: str, summary: str) -> None:
         key = self._sum_key(conversation_id)
@@ -44,4 +42,80 @@ class RedisConversationStore:
     def get_summary(self, conversation_id: str) -> Optional[str]:
         key = self._sum_key(conversation_id)
         v = self.r.get(key)
-        return v if v else None
\ No newline at end of file
+        return v if v else None
+
+
+class AsyncRedisConversationStore:
+    def __init__(self, redis_url: str, ttl_seconds: int, max_turns: int, max_connections: int = 64) -> None:
+        self.pool = aioredis.ConnectionPool.from_url(redis_url, decode_responses=True, max_connections=int(max_connections))
+        self.r = aioredis.Redis(connection_pool=self.pool)
+        self.bpool = aioredis.ConnectionPool.from_url(redis_url, max_connections=int(max_connections))
+        self.rb = aioredis.Redis(connection_pool=self.bpool)
+        self.ttl_seconds = int(ttl_seconds)
+        self.max_turns = int(max_turns)
+
+    def _key(self, conversation_id: str) -> str:
+        return f"conv:{conversation_id}:msgs"
+
+    def _sum_key(self, conversation_id: str) -> str:
+        return f"conv:{conversation_id}:summary"
+
+    def _push(self, pipe, conversation_id: str, role: str, content: str) -> None:
+        key = self._key(conversation_id)
+        pipe.rpush(key, encode_turn(role, content))
+        pipe.ltrim(key, -self.max_turns * 2, -1)
+        pipe.expire(key, self.ttl_seconds)
+
+    async def append(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        writes: Optional[List[Tuple[str, int, bytes]]] = None,
+    ) -> int:
+        async with self.rb.pipeline() as pipe:
+            self._push(pipe, conversation_id, role, content)
+            for key, ttl, value in writes or ():
+                pipe.setex(key, ttl, value)
+            res = await pipe.execute()
+        return min(int(res[0]), self.max_turns * 2)
+
+    async def append_and_load(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        keys: Sequence[str] = (),
+    ) -> Tuple[List[Dict[str, str]], Optional[str], Dict[str, Optional[bytes]]]:
+        async with self.rb.pipeline() as pipe:
+            self._push(pipe, conversation_id, role, content)
+            pipe.lrange(self._key(conversation_id), 0, -1)
+            pipe.get(self._sum_key(conversation_id))
+            for key in keys:
+                pipe.get(key)
+            res = await pipe.execute()
+        summary = res[4].decode("utf-8") if res[4] else None
+        return _decode(res[3] or []), summary, dict(zip(keys, res[5:]))
+
+    async def drop_oldest(self, conversation_id: str, n: int) -> None:
+        if n > 0:
+            await self.rb.ltrim(self._key(conversation_id), int(n), -1)
+
+    async def history(self, conversation_id: str) -> List[Dict[str, str]]:
+        key = self._key(conversation_id)
+        return _decode(await self.rb.lrange(key, 0, -1) or [])
+
+    async def set_summary(self, conversation_id: str, summary: str) -> None:
+        key = self._sum_key(conversation_id)
+        await self.r.setex(key, self.ttl_seconds, summary)
+
+    async def get_summary(self, conversation_id: str) -> Optional[str]:
+        key = self._sum_key(conversation_id)
+        v = await self.r.get(key)
+        return v if v else None
+
+    async def aclose(self) -> None:
+        await self.r.aclose()
+        await self.rb.aclose()
+        await self.pool.aclose()
+        await self.bpool.aclose()
@@ -0,0 +1,83 @@
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from api.rag.lexical import LexicalIndex
+from api.rag.retriever import RetrievedChunk
+from api.stores.codec import decode_hits, decode_turn, encode_hits, encode_turn
+
+
+WORDS = "алюминий лист рулон сплав АД31 АМг3 толщина ширина поставка доставка склад сертификат прайс тонна резка упаковка".split()
+
+
+def corpus(n: int, words: int, seed: int = 7):
+    rng = random.Random(seed)
+    for i in range(n):
+        text = " ".join(rng.choice(WORDS) for _ in range(words))
+        yield f"id{i}", {"doc_id": f"doc_{i // 8}:{i % 8}", "title": f"doc_{i // 8}", "source_path": f"data/docs/doc_{i // 8}.md", "text": text}
+
+
+def timed(fn, runs: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - t0) / runs * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=5000)
+    ap.add_argument("--words", type=int, default=120)
+    ap.add_argument("--top-k", type=int, default=6)
+    ap.add_argument("--runs", type=int, default=5000)
+    args = ap.parse_args()
+
+    docs = list(corpus(args.docs, args.words))
+    with tempfile.TemporaryDirectory() as tmp:
+        LexicalIndex.write(Path(tmp), docs)
+        index = LexicalIndex.load(Path(tmp))
+        picked = [p for _, p in random.Random(1).sample(docs, args.top_k)]
+        chunks = [RetrievedChunk(p["doc_id"], p["title"], 0.5 + i / 100, p["source_path"], p["text"], 3.2) for i, p in enumerate(picked)]
+
+        before = json.dumps([c.__dict__ for c in chunks], ensure_ascii=False).encode("utf-8")
+        after = encode_hits([(c.doc_id, c.score, c.lexical_score) for c in chunks])
+
+        def decode_json():
+            return [RetrievedChunk(**x) for x in json.loads(before)]
+
+        def decode_binary():
+            out = []
+            for doc_id, score, lexical_score in decode_hits(after):
+                row = index.row(doc_id)
+                meta = index.meta[row]
+                out.append(RetrievedChunk(doc_id, meta["title"], score, meta["source_path"], index.text(row), lexical_score))
+            return out
+
+        assert [c.text for c in decode_binary()] == [c.text for c in decode_json()]
+        print({
+            "retrieval_entry": {
+                "bytes_before": len(before),
+                "bytes_after": len(after),
+                "decode_us_before": round(timed(decode_json, args.runs), 2),
+                "decode_us_after": round(timed(decode_binary, args.runs), 2),
+            }
+        })
+
+    turn = {"role": "assistant", "content": docs[0][1]["text"]}
+    t_before = json.dumps(turn, ensure_ascii=False).encode("utf-8")
+    t_after = encode_turn(turn["role"], turn["content"])
+    print({
+        "history_item": {
+            "bytes_before": len(t_before),
+            "bytes_after": len(t_after),
+            "decode_us_before": round(timed(lambda: json.loads(t_before), args.runs), 2),
+            "decode_us_after": round(timed(lambda: decode_turn(t_after), args.runs), 2),
+        }
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+
+from api.app.metrics import Metrics
+from api.intent.routing import match_rules, normalize
+from api.rag.pipeline import ChatPipeline
+from api.rag.retriever import RetrievedChunk
+from api.schemas.chat import ChatRequest
+from api.settings import Settings
+
+
+class Latency:
+    def __init__(self, rng: random.Random, jitter: float) -> None:
+        self.rng = rng
+        self.jitter = jitter
+
+    async def sleep(self, ms: float) -> None:
+        if ms > 0:
+            await asyncio.sleep(ms * self.rng.lognormvariate(0.0, self.jitter) / 1000.0)
+
+
+class StubConversations:
+    def __init__(self, lat: Latency, redis_ms: float) -> None:
+        self.lat = lat
+        self.redis_ms = redis_ms
+
+    async def append_and_load(self, conv, role, content, keys=()):
+        await self.lat.sleep(self.redis_ms)
+        return [], None, {k: None for k in keys}
+
+    async def append(self, conv, role, content, writes=None):
+        await self.lat.sleep(self.redis_ms)
+        return 2
+
+
+class StubEmbedder:
+    provider = "stub"
+    model_name = "stub"
+
+    def __init__(self, lat: Latency, embed_ms: float) -> None:
+        self.lat = lat
+        self.embed_ms = embed_ms
+
+    async def aembed(self, texts):
+        await self.lat.sleep(self.embed_ms)
+        return [[1.0, 0.0] for _ in texts]
+
+
+class StubRetriever:
+    def __init__(self, lat: Latency, embedder: StubEmbedder, search_ms: float, redis_ms: float) -> None:
+        self.lat = lat
+        self.embedder = embedder
+        self.search_ms = search_ms
+        self.redis_ms = redis_ms
+
+    async def prefetch_key(self, query, top_k=None, mode=None):
+        return f"retr:{query}"
+
+    async def index_version(self):
+        return 1
+
+    async def retrieve(self, query, top_k=None, vector=None, prefetched=None, writes=None, **kwargs):
+        if prefetched is None:
+            await self.lat.sleep(self.redis_ms)
+        if vector is None:
+            await self.embedder.aembed([query])
+        await self.lat.sleep(self.search_ms)
+        return [RetrievedChunk(f"doc:{i}", "doc", 0.9 - i / 100, "data/docs/doc.md", "текст " * 40, 2.0) for i in range(4)]
+
+
+class StubRouter:
+    def __init__(self, needs_vector: bool) -> None:
+        self.needs_vector = needs_vector
+
+    def resolve(self, text):
+        return match_rules(normalize(text))
+
+    def classify(self, text, vector=None):
+        return "OPERATOR" if "заявк" in text else "RAG"
+
+
+class StubLLM:
+    def __init__(self, lat: Latency, llm_ms: float) -> None:
+        self.lat = lat
+        self.llm_ms = llm_ms
+
+    async def complete(self, messages):
+        await self.lat.sleep(self.llm_ms)
+        return "ответ"
+
+
+def build(args, speculative: bool, seed: int) -> ChatPipeline:
+    lat = Latency(random.Random(seed), args.jitter)
+    settings = Settings(chat_speculative_retrieval=speculative, semantic_cache_enabled=False, summary_enabled=False)
+    embedder = StubEmbedder(lat, args.embed_ms)
+    p = ChatPipeline(
+        settings=settings,
+        metrics=Metrics(),
+        conv_store=StubConversations(lat, args.redis_ms),
+        qdrant=None,
+        embedder=embedder,
+        llm=StubLLM(lat, args.llm_ms),
+        intent_router=StubRouter(args.embedding_intent),
+    )
+    p.retriever = StubRetriever(lat, embedder, args.search_ms, args.redis_ms)
+    return p
+
+
+async def run(args, speculative: bool) -> dict:
+    p = build(args, speculative, seed=1)
+    rng = random.Random(2)
+    plan, total = [], []
+    for i in range(args.turns):
+        u = rng.random()
+        if u < args.cta_share:
+            msg = "Нужен прайс"
+        elif u < args.cta_share + args.model_operator_share:
+            msg = f"Хочу оформить заявку {i}"
+        else:
+            msg = f"Какие сроки поставки {i}?"
+        t0 = time.perf_counter()
+        turn = await p._plan(ChatRequest(conversation_id="bench", message=msg))
+        plan.append((time.perf_counter() - t0) * 1000.0)
+        if turn.answer is None:
+            turn.answer = await p._generate(turn.messages)
+        await p._append_answer("bench", turn)
+        total.append((time.perf_counter() - t0) * 1000.0)
+    counters = p.m.snapshot()["counters"]
+    return {
+        "mode": "speculative" if speculative else "sequential",
+        "plan_p50_ms": round(float(np.percentile(plan, 50)), 2),
+        "plan_p95_ms": round(float(np.percentile(plan, 95)), 2),
+        "turn_p50_ms": round(float(np.percentile(total, 50)), 2),
+        "turn_p95_ms": round(float(np.percentile(total, 95)), 2),
+        "critical": {k[len("plan_critical_"):]: v for k, v in counters.items() if k.startswith("plan_critical_")},
+        "cancelled": counters.get("speculative_retrieval_cancelled", 0),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, default=300)
+    ap.add_argument("--redis-ms", type=float, default=2.0)
+    ap.add_argument("--embed-ms", type=float, default=12.0)
+    ap.add_argument("--search-ms", type=float, default=8.0)
+    ap.add_argument("--llm-ms", type=float, default=400.0)
+    ap.add_argument("--jitter", type=float, default=0.3)
+    ap.add_argument("--cta-share", type=float, default=0.1)
+    ap.add_argument("--model-operator-share", type=float, default=0.1)
+    ap.add_argument("--embedding-intent", action="store_true")
+    args = ap.parse_args()
+    for speculative in (False, True):
+        print(asyncio.run(run(args, speculative)))
+
+
+if __name__ == "__main__":
+    main()
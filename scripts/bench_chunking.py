@@ -0,0 +1,85 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from api.rag.indexer import IngestStats, chunk_pool, iter_changes, worth_parallel
+from api.rag.chunking import read_markdown_files
+from api.settings import settings
+
+
+WORDS = "алюминий лист рулон сплав АД31 АМг3 толщина ширина поставка доставка склад сертификат прайс тонна резка упаковка".split()
+
+
+def make_corpus(root: Path, files: int, sections: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    for i in range(files):
+        lines = []
+        for j in range(sections):
+            lines.append(f"# Раздел {j}")
+            for _ in range(rng.randint(3, 12)):
+                lines.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 24))))
+            lines.append("")
+        (root / f"doc_{i:05d}.md").write_text("\n".join(lines), encoding="utf-8")
+
+
+def scan(docs: str, pool, workers: int) -> tuple:
+    stats = IngestStats()
+    t0 = time.perf_counter()
+    n = sum(1 for _ in iter_changes(docs, None, {}, stats, executor=pool, window=workers * 2))
+    return stats, n, time.perf_counter() - t0
+
+
+def run(docs: str, workers: int, repeats: int) -> dict:
+    t0 = time.perf_counter()
+    pool = chunk_pool(workers)
+    if pool is not None:
+        list(pool.map(abs, range(workers * 4)))
+    start = time.perf_counter() - t0
+    try:
+        runs = [scan(docs, pool, workers) for _ in range(max(1, repeats))]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    stats, n, _ = runs[0]
+    dt = min(r[2] for r in runs)
+    return {
+        "workers": workers,
+        "files": stats.files,
+        "chunks": n,
+        "pool_start_sec": round(start, 3),
+        "sec": round(dt, 4),
+        "files_per_sec": round(stats.files / dt, 1),
+        "chunks_per_sec": round(n / dt, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=3000)
+    ap.add_argument("--sections", type=int, default=12)
+    ap.add_argument("--workers", type=int, nargs="+", default=None)
+    ap.add_argument("--repeats", type=int, default=3)
+    args = ap.parse_args()
+    cores = os.cpu_count() or 1
+    workers = args.workers or sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+    with tempfile.TemporaryDirectory() as tmp:
+        make_corpus(Path(tmp), args.files, args.sections)
+        paths = [str(fp) for fp in read_markdown_files(tmp)]
+        print({
+            "cores": cores,
+            "bytes": sum(os.stat(p).st_size for p in paths),
+            "pool_used_by_ingest": worth_parallel(paths, settings.ingest_parallel_min_files, settings.ingest_parallel_min_bytes),
+        })
+        base = None
+        for w in workers:
+            out = run(tmp, w, args.repeats)
+            base = base or out["sec"]
+            out["speedup"] = base / out["sec"]
+            print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from api.rag.chunking import build_chunks
+from api.rag.embeddings import EmbeddingClient
+from api.settings import settings
+
+
+def corpus(docs: str, qa: str, intents: str):
+    texts = [c.text for c in build_chunks(docs)]
+    for path in (qa, intents):
+        if Path(path).exists():
+            for line in Path(path).read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    obj = json.loads(line)
+                    texts.append(obj.get("question") or obj.get("text"))
+    return [t for t in texts if t]
+
+
+def load(provider: str, args) -> tuple:
+    t0 = time.perf_counter()
+    client = EmbeddingClient(
+        provider,
+        args.model,
+        onnx_path=args.onnx_path,
+        max_length=args.max_length,
+        threads=args.threads,
+    )
+    client.embed(["warmup"])
+    return client, time.perf_counter() - t0
+
+
+def perf(client: EmbeddingClient, texts, runs: int, batch: int) -> dict:
+    lat = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        client.embed([texts[i % len(texts)]])
+        lat.append((time.perf_counter() - t0) * 1000.0)
+    pool = (texts * (1 + 4 * batch // max(1, len(texts))))[: 4 * batch]
+    t0 = time.perf_counter()
+    for lo in range(0, len(pool), batch):
+        client.embed(pool[lo : lo + batch])
+    elapsed = time.perf_counter() - t0
+    return {
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p99_ms": round(float(np.percentile(lat, 99)), 2),
+        f"batch{batch}_texts_per_s": round(len(pool) / elapsed, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=settings.embedding_model)
+    ap.add_argument("--onnx-path", default=settings.embedding_onnx_path)
+    ap.add_argument("--max-length", type=int, default=settings.embedding_max_length)
+    ap.add_argument("--threads", type=int, default=settings.embedding_threads)
+    ap.add_argument("--docs", default="data/docs")
+    ap.add_argument("--qa", default="data/eval/qa.jsonl")
+    ap.add_argument("--intents", default="data/intents/train.jsonl")
+    ap.add_argument("--min-cosine", type=float, default=0.99)
+    ap.add_argument("--runs", type=int, default=200)
+    ap.add_argument("--batch", type=int, default=32)
+    args = ap.parse_args()
+
+    texts = corpus(args.docs, args.qa, args.intents)
+    ref, ref_load = load("sentence_transformers", args)
+    onnx, onnx_load = load("onnx", args)
+
+    a, b = ref.embed(texts), onnx.embed(texts)
+    cos = (a * b).sum(axis=1)
+    sims_a, sims_b = a @ a.T, b @ b.T
+    np.fill_diagonal(sims_a, -1.0)
+    np.fill_diagonal(sims_b, -1.0)
+    parity = {
+        "texts": len(texts),
+        "dtype": str(b.dtype),
+        "cosine_min": round(float(cos.min()), 5),
+        "cosine_mean": round(float(cos.mean()), 5),
+        "nearest_neighbour_agreement": round(float((sims_a.argmax(axis=1) == sims_b.argmax(axis=1)).mean()), 4),
+    }
+    print({"parity": parity})
+    for name, client, load_s in (("sentence_transformers", ref, ref_load), ("onnx", onnx, onnx_load)):
+        print({"provider": name, "load_sec": round(load_s, 2), **perf(client, texts, args.runs, args.batch)})
+    ref.close()
+    onnx.close()
+    if parity["cosine_min"] < args.min_cosine:
+        raise SystemExit(f"parity failed: min cosine {parity['cosine_min']} < {args.min_cosine}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from api.intent.routing import IntentRouter, match_rules, normalize
+from api.intent.train import load_jsonl, train
+
+
+WORDS = "алюминий лист рулон сплав АД31 АМг3 толщина ширина поставка доставка склад сертификат тонна резка упаковка Москва сроки цена".split()
+
+
+def queries(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))) + "?" for _ in range(n)]
+
+
+def per_call(fn, texts):
+    lat = np.empty(len(texts))
+    for i, t in enumerate(texts):
+        t0 = time.perf_counter()
+        fn(t)
+        lat[i] = time.perf_counter() - t0
+    return {
+        "routes_per_s": round(len(texts) / lat.sum()),
+        "p50_us": round(float(np.percentile(lat, 50)) * 1e6, 1),
+        "p99_us": round(float(np.percentile(lat, 99)) * 1e6, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--train", default="data/intents/train.jsonl")
+    ap.add_argument("--queries", type=int, default=5000)
+    ap.add_argument("--distinct", type=int, default=500)
+    ap.add_argument("--batch", type=int, default=64)
+    args = ap.parse_args()
+
+    model = train(args.train)
+    distinct = queries(args.distinct)
+    rng = random.Random(1)
+    stream = [rng.choice(distinct) for _ in range(args.queries)]
+    x_train, _ = load_jsonl(args.train)
+
+    legacy = [model.pipeline.predict([t])[0] for t in distinct + x_train]
+    fast = [model.scorer.predict_one(t) for t in distinct + x_train]
+    assert legacy == fast, "scorer disagrees with sklearn pipeline"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "intent_model.joblib")
+        model.save(path)
+        uncached = IntentRouter(path, cache_max_entries=0)
+        cached = IntentRouter(path, cache_max_entries=4096)
+
+        results = {
+            "sklearn_predict": per_call(lambda t: model.pipeline.predict([t]), stream),
+            "rules_only": per_call(lambda t: match_rules(normalize(t)), stream),
+            "scorer_predict": per_call(model.scorer.predict_one, stream),
+            "route_uncached": per_call(uncached.route, stream),
+            "route_cached": per_call(cached.route, stream),
+        }
+        batches = [stream[i : i + args.batch] for i in range(0, len(stream), args.batch)]
+        fresh = IntentRouter(path, cache_max_entries=0)
+        t0 = time.perf_counter()
+        for b in batches:
+            fresh.route_many(b)
+        results["route_many_uncached"] = {"routes_per_s": round(len(stream) / (time.perf_counter() - t0)), "batch": args.batch}
+
+    print({"queries": len(stream), "distinct": len(distinct), "cache_hit_ratio": round(1 - len(set(stream)) / len(stream), 3)})
+    for name, r in results.items():
+        print(f"{name:22s} {r}")
+
+
+if __name__ == "__main__":
+    main()
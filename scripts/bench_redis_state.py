@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import numpy as np
+from redis.asyncio.client import Pipeline
+
+from api.stores.redis_store import AsyncRedisConversationStore
+
+
+class RoundTrips:
+    def __init__(self, store: AsyncRedisConversationStore) -> None:
+        self.n = 0
+        pipe_execute = Pipeline.execute
+
+        async def counted_pipeline(pipe, *args, **kwargs):
+            self.n += 1
+            return await pipe_execute(pipe, *args, **kwargs)
+
+        for client in (store.r, store.rb):
+            client.execute_command = self._counted(client.execute_command)
+        Pipeline.execute = counted_pipeline
+
+    def _counted(self, command):
+        async def run(*args, **kwargs):
+            self.n += 1
+            return await command(*args, **kwargs)
+
+        return run
+
+
+async def legacy_turn(store: AsyncRedisConversationStore, conv: str, msg: str, key: str, value: str, ttl: int) -> None:
+    await store.append(conv, "user", msg)
+    await asyncio.gather(store.history(conv), store.get_summary(conv))
+    if await store.rb.get(key) is None:
+        await store.rb.setex(key, ttl, value)
+    await store.append(conv, "assistant", "ok")
+
+
+async def batched_turn(store: AsyncRedisConversationStore, conv: str, msg: str, key: str, value: str, ttl: int) -> None:
+    _, _, prefetched = await store.append_and_load(conv, "user", msg, keys=[key])
+    writes = [(key, ttl, value)] if prefetched.get(key) is None else []
+    await store.append(conv, "assistant", "ok", writes=writes)
+
+
+async def run(store: AsyncRedisConversationStore, rtt: RoundTrips, turn, turns: int) -> dict:
+    value = json.dumps([{"doc_id": f"faq:{i}", "score": 0.5, "text": "x" * 400} for i in range(6)])
+    conv = uuid.uuid4().hex
+    lat = []
+    rtt.n = 0
+    for i in range(turns):
+        t0 = time.perf_counter()
+        await turn(store, conv, f"вопрос {i}", f"bench:retr:{conv}:{i}", value, 60)
+        lat.append((time.perf_counter() - t0) * 1000.0)
+    trips = rtt.n
+    await store.r.delete(store._key(conv))
+    xs = np.array(lat)
+    return {
+        "rtt_per_turn": trips / turns,
+        "p50_ms": float(np.percentile(xs, 50)),
+        "p95_ms": float(np.percentile(xs, 95)),
+    }
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--redis-url", default="redis://localhost:6379/0")
+    ap.add_argument("--turns", type=int, default=500)
+    args = ap.parse_args()
+    store = AsyncRedisConversationStore(args.redis_url, ttl_seconds=600, max_turns=14)
+    rtt = RoundTrips(store)
+    try:
+        for name, turn in (("before", legacy_turn), ("after", batched_turn)):
+            print({"mode": name, **await run(store, rtt, turn, args.turns)})
+    finally:
+        await store.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from api.app.metrics import Metrics
+from api.rag.chunking import build_chunks
+from api.rag.rerank import CrossEncoderReranker
+from api.rag.retriever import RetrievedChunk
+from api.settings import settings
+
+
+def candidates(docs: str, n: int):
+    chunks = build_chunks(docs)
+    return [
+        RetrievedChunk(doc_id=c.doc_id, title=c.title, score=0.0, source_path=c.source_path, text=c.text)
+        for c in (chunks * (1 + n // max(1, len(chunks))))[:n]
+    ]
+
+
+async def run(reranker: CrossEncoderReranker, queries, chunks, requests: int, concurrency: int, budget_ms, rate: float):
+    gate = asyncio.Semaphore(concurrency)
+    lat, reranked = [], 0
+
+    async def one(i: int):
+        nonlocal reranked
+        if rate > 0:
+            await asyncio.sleep(i / rate)
+        async with gate:
+            t0 = time.perf_counter()
+            out = await reranker.rerank(f"{queries[i % len(queries)]} #{i}", chunks, 5, budget_ms=budget_ms)
+            lat.append((time.perf_counter() - t0) * 1000.0)
+            reranked += out is not None
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return lat, reranked, time.perf_counter() - t0
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=settings.rerank_model)
+    ap.add_argument("--docs", default="data/docs")
+    ap.add_argument("--qa", default="data/eval/qa.jsonl")
+    ap.add_argument("--candidates", type=int, default=settings.rerank_candidates)
+    ap.add_argument("--budget-ms", type=float, default=settings.rerank_budget_ms or 250.0)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--rate", type=float, default=0.0, help="arrivals per second; 0 sends all requests at once")
+    ap.add_argument("--slack-ms", type=float, default=50.0)
+    args = ap.parse_args()
+
+    lines = Path(args.qa).read_text(encoding="utf-8").splitlines() if Path(args.qa).exists() else []
+    queries = [json.loads(x)["question"] for x in lines if x.strip()] or ["сроки поставки"]
+    chunks = candidates(args.docs, args.candidates)
+    m = Metrics()
+    reranker = CrossEncoderReranker(args.model, batch_size=settings.rerank_batch_size, metrics=m)
+    try:
+        await reranker.rerank("warmup", chunks, 5)
+        lat, reranked, elapsed = await run(reranker, queries, chunks, args.requests, args.concurrency, args.budget_ms, args.rate)
+    finally:
+        reranker.close()
+    xs = np.array(lat)
+    counters = m.snapshot()["counters"]
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "budget_ms": args.budget_ms,
+        "reranked": reranked,
+        "busy": counters.get("rerank_busy", 0),
+        "timeout": counters.get("rerank_timeout", 0),
+        "p50_ms": round(float(np.percentile(xs, 50)), 2),
+        "p99_ms": round(float(np.percentile(xs, 99)), 2),
+        "max_ms": round(float(xs.max()), 2),
+        "req_per_s": round(args.requests / elapsed, 1),
+    }
+    print(report)
+    if report["max_ms"] > args.budget_ms + args.slack_ms:
+        raise SystemExit(f"rerank latency not capped: max {report['max_ms']} ms > budget {args.budget_ms} + {args.slack_ms} ms")
+    if not reranked:
+        raise SystemExit("no request was reranked")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
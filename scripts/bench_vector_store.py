@@ -0,0 +1,111 @@
+import argparse
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from api.stores.base import VectorPoint
+from api.stores.local_store import LocalVectorStore
+
+
+def fill(store, n: int, dim: int, batch: int, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    target = store.create_version(dim)
+    for lo in range(0, n, batch):
+        m = rng.standard_normal((min(batch, n - lo), dim)).astype(np.float32)
+        store.upsert(
+            [
+                VectorPoint(id=str(uuid.UUID(int=lo + i + 1)), vector=v, payload={"doc_id": f"d{lo + i}", "text": f"chunk {lo + i}"})
+                for i, v in enumerate(m)
+            ],
+            target,
+        )
+    store.flush(target)
+    store.swap(target)
+    return rng.standard_normal((256, dim)).astype(np.float32)
+
+
+def measure(store, queries: np.ndarray, top_k: int, runs: int) -> dict:
+    for q in queries[:5]:
+        store.search(q, top_k)
+    xs = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        store.search(queries[i % len(queries)], top_k)
+        xs.append((time.perf_counter() - t0) * 1000.0)
+    xs.sort()
+    return {"p50_ms": xs[len(xs) // 2], "p95_ms": xs[int(len(xs) * 0.95) - 1]}
+
+
+def measure_update(store, queries: np.ndarray, rows: int, runs: int) -> dict:
+    xs = []
+    for r in range(runs):
+        t0 = time.perf_counter()
+        store.upsert(
+            [VectorPoint(id=str(uuid.uuid4()), vector=queries[(r * rows + i) % len(queries)], payload={"doc_id": f"u{r}", "text": "update"}) for i in range(rows)]
+        )
+        store.flush()
+        xs.append((time.perf_counter() - t0) * 1000.0)
+    xs.sort()
+    return {"update_rows": rows, "update_p50_ms": round(xs[len(xs) // 2], 2), "update_max_ms": round(xs[-1], 2)}
+
+
+def measure_many(store, queries: np.ndarray, top_k: int, n_queries: int, batch: int) -> dict:
+    qs = queries[np.arange(n_queries) % len(queries)]
+    t0 = time.perf_counter()
+    for q in qs:
+        store.search(q, top_k)
+    loop = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for lo in range(0, n_queries, batch):
+        store.search_many(qs[lo : lo + batch], [top_k] * len(qs[lo : lo + batch]))
+    batched = time.perf_counter() - t0
+    return {"queries": n_queries, "loop_sec": round(loop, 3), f"batch{batch}_sec": round(batched, 3), "speedup": round(loop / batched, 1)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--runs", type=int, default=200)
+    ap.add_argument("--batch", type=int, default=10_000)
+    ap.add_argument("--qdrant-url", default=None)
+    ap.add_argument("--many-queries", type=int, default=2000)
+    ap.add_argument("--many-batch", type=int, default=64)
+    ap.add_argument("--update-rows", type=int, default=10)
+    ap.add_argument("--update-runs", type=int, default=20)
+    args = ap.parse_args()
+    for n in args.sizes:
+        for quantize in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                store = LocalVectorStore(tmp, "bench", quantize=quantize)
+                t0 = time.perf_counter()
+                queries = fill(store, n, args.dim, args.batch)
+                build = time.perf_counter() - t0
+                out = measure(store, queries, args.top_k, args.runs)
+                print({"store": "local-int8" if quantize else "local-f32", "n": n, "build_sec": round(build, 2), **out})
+                if args.many_queries:
+                    print({"store": "local-int8" if quantize else "local-f32", "n": n, **measure_many(store, queries, args.top_k, args.many_queries, args.many_batch)})
+                if args.update_runs:
+                    print({"store": "local-int8" if quantize else "local-f32", "n": n, **measure_update(store, queries, args.update_rows, args.update_runs)})
+        if args.qdrant_url:
+            from api.stores.qdrant_store import QdrantStore
+
+            store = QdrantStore(args.qdrant_url, f"bench_{n}")
+            t0 = time.perf_counter()
+            queries = fill(store, n, args.dim, 1000)
+            build = time.perf_counter() - t0
+            out = measure(store, queries, args.top_k, args.runs)
+            print({"store": "qdrant", "n": n, "build_sec": round(build, 2), **out})
+            if args.many_queries:
+                print({"store": "qdrant", "n": n, **measure_many(store, queries, args.top_k, args.many_queries, args.many_batch)})
+            if args.update_runs:
+                print({"store": "qdrant", "n": n, **measure_update(store, queries, args.update_rows, args.update_runs)})
+            for _, name in store.versions():
+                store.drop(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from api.rag.indexer import IngestStats, iter_changes
+
+
+TEXT = "# Доставка\nСроки поставки листа и рулона со склада составляют от одного до трёх рабочих дней.\n"
+
+
+def run(docs: str, manifest: dict) -> tuple:
+    stats = IngestStats()
+    changed = dict(iter_changes(docs, None, manifest, stats))
+    new = {k: json.loads(v) for k, v in stats.manifest_set.items()}
+    return stats, changed, {**{k: v for k, v in manifest.items() if k not in stats.manifest_del}, **new}
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "docs"
+        for sub in ("sales", "support"):
+            (root / sub).mkdir(parents=True)
+            (root / sub / "faq.md").write_text(TEXT, encoding="utf-8")
+        (root / "faq.md").write_text(TEXT, encoding="utf-8")
+
+        stats, changed, manifest = run(str(root), {})
+        doc_ids = sorted(c.doc_id for c in changed.values())
+        print({"manifest_keys": sorted(manifest), "doc_ids": doc_ids, "points": len(changed)})
+        assert sorted(manifest) == ["faq.md", "sales/faq.md", "support/faq.md"], manifest
+        assert doc_ids == ["faq:0", "sales/faq:0", "support/faq:0"], doc_ids
+        assert len(changed) == 3 and stats.added == 3, "same-named files must get distinct point ids"
+
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            stats, changed, manifest = run("./docs/", manifest)
+        finally:
+            os.chdir(cwd)
+        print({"respelled_root": {"added": stats.added, "deleted": stats.deleted, "skipped": stats.skipped}})
+        assert not changed and not stats.deletes and stats.skipped == 3, "a different docs_path spelling must not re-add files"
+
+        (root / "support" / "faq.md").unlink()
+        stats, changed, manifest = run(str(root.resolve()), manifest)
+        print({"after_delete": {"deleted": stats.deleted, "manifest_del": stats.manifest_del}})
+        assert stats.manifest_del == ["support/faq.md"] and stats.deleted == 1, "stale entries must be deleted"
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
+import argparse
+import asyncio
 import json
+import time
 from pathlib import Path
 import numpy as np
 
 from api.app.deps import deps
+from api.rag.rerank import CrossEncoderReranker
+from api.settings import settings
 
 
 def recall_at_k(targets, ranked, k):
@@ -17,33 +22,76 @@ def mrr_at_k(targets, ranked, k):
     return 0.0
 
 
-def main():
-    p = deps.pipeline()
-    qa = [json.loads(x) for x in Path("data/eval/qa.jsonl").read_text(encoding="utf-8").splitlines() if x.strip()]
-
-    ks = [1, 3, 5, 10]
+async def evaluate(p, qa, mode, ks, rerank=False, batch_size=64):
     rec = {k: [] for k in ks}
     mrr = {k: [] for k in ks}
-
-    for item in qa:
-        q = item["question"]
-        targets = item["relevant_doc_ids"]
-        hits = p.retriever.retrieve(q, top_k=max(ks))
-        ranked = [h.doc_id for h in hits]
-        for k in ks:
-            rec[k].append(recall_at_k(targets, ranked, k))
-            mrr[k].append(mrr_at_k(targets, ranked, k))
-
-    report = {
-        "n": len(qa),
+    lat = []
+    started = time.perf_counter()
+    for lo in range(0, len(qa), max(1, batch_size)):
+        batch = qa[lo : lo + max(1, batch_size)]
+        t0 = time.perf_counter()
+        if batch_size > 1:
+            results = await p.retriever.retrieve_many(
+                [item["question"] for item in batch], top_k=max(ks), mode=mode, use_cache=False, rerank=rerank
+            )
+        else:
+            results = [await p.retriever.retrieve(batch[0]["question"], top_k=max(ks), mode=mode, use_cache=False, rerank=rerank)]
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        for item, hits in zip(batch, results):
+            targets = item["relevant_doc_ids"]
+            ranked = [h.doc_id for h in hits]
+            for k in ks:
+                rec[k].append(recall_at_k(targets, ranked, k))
+                mrr[k].append(mrr_at_k(targets, ranked, k))
+    runtime = time.perf_counter() - started
+    xs = np.array(lat) if lat else np.zeros(1)
+    return {
         "recall": {str(k): float(np.mean(v)) for k, v in rec.items()},
         "mrr": {str(k): float(np.mean(v)) for k, v in mrr.items()},
+        "latency_ms": {"p50": float(np.percentile(xs, 50)), "p95": float(np.percentile(xs, 95))},
+        "batch_size": max(1, batch_size),
+        "runtime_s": runtime,
+        "queries_per_s": len(qa) / runtime if runtime > 0 else 0.0,
     }
 
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--qa", default="data/eval/qa.jsonl")
+    ap.add_argument("--modes", nargs="+", default=["dense", "lexical", "hybrid"])
+    ap.add_argument("--rerank", action="store_true")
+    ap.add_argument("--rerank-budget-ms", type=float, default=None)
+    ap.add_argument("--batch-size", type=int, default=64)
+    args = ap.parse_args()
+
+    p = deps.pipeline()
+    if args.rerank and p.retriever.reranker is None:
+        p.retriever.reranker = CrossEncoderReranker(settings.rerank_model, batch_size=settings.rerank_batch_size)
+    p.retriever.rerank_budget_ms = args.rerank_budget_ms
+    qa = [json.loads(x) for x in Path(args.qa).read_text(encoding="utf-8").splitlines() if x.strip()]
+    ks = [1, 3, 5, 10]
+
+    report = {"n": len(qa), "modes": {}}
+    for mode in args.modes:
+        if mode == "lexical" and (p.retriever.lexical is None or p.retriever.lexical.current() is None):
+            report["modes"][mode] = {"skipped": "no lexical index; run ingest first"}
+            continue
+        report["modes"][mode] = await evaluate(p, qa, mode, ks, batch_size=args.batch_size)
+        if args.rerank:
+            p.retriever.reranker.clear()
+            base = report["modes"][mode]
+            out = await evaluate(p, qa, mode, ks, rerank=True, batch_size=args.batch_size)
+            out["gain"] = {
+                "recall": {k: out["recall"][k] - base["recall"][k] for k in out["recall"]},
+                "mrr": {k: out["mrr"][k] - base["mrr"][k] for k in out["mrr"]},
+                "latency_ms": {q: out["latency_ms"][q] - base["latency_ms"][q] for q in out["latency_ms"]},
+            }
+            report["modes"][f"{mode}+rerank"] = out
+
     Path("reports").mkdir(parents=True, exist_ok=True)
     Path("reports/retrieval_eval.json").write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
     print(report)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
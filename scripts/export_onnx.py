@@ -0,0 +1,57 @@
+import argparse
+from pathlib import Path
+
+from api.settings import settings
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=settings.embedding_model)
+    ap.add_argument("--out", default=settings.embedding_onnx_path)
+    ap.add_argument("--opset", type=int, default=17)
+    ap.add_argument("--no-quantize", action="store_true")
+    args = ap.parse_args()
+
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    class LastHidden(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids).last_hidden_state
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(args.model, use_fast=True)
+    model = AutoModel.from_pretrained(args.model).eval()
+    sample = tokenizer(["Какие сроки поставки?", "Нужен сертификат на лист АМг3"], padding=True, return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    axes = {n: {0: "batch", 1: "sequence"} for n in names + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHidden(model),
+            tuple(sample[n] for n in names),
+            str(out / "model.onnx"),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=axes,
+            opset_version=args.opset,
+            do_constant_folding=True,
+        )
+    tokenizer.save_pretrained(str(out))
+    if not (out / "tokenizer.json").exists():
+        raise SystemExit(f"{args.model} has no fast tokenizer; tokenizer.json is required by the onnx provider")
+    print({"model.onnx_mb": round((out / "model.onnx").stat().st_size / 2**20, 1)})
+
+    if not args.no_quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(out / "model.onnx"), str(out / "model_int8.onnx"), weight_type=QuantType.QInt8)
+        print({"model_int8.onnx_mb": round((out / "model_int8.onnx").stat().st_size / 2**20, 1)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+import json
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+ANSWER = "Сроки поставки зависят от объёма и спецификации, обычно 2-4 недели [1]."
+
+
+def create_app(first_token_ms: float = 300.0, token_ms: float = 40.0) -> FastAPI:
+    app = FastAPI(title="fake-llm")
+
+    @app.post("/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        tokens = ANSWER.split(" ")
+        if not body.get("stream"):
+            await asyncio.sleep((first_token_ms + token_ms * len(tokens)) / 1000.0)
+            return JSONResponse({"choices": [{"index": 0, "message": {"role": "assistant", "content": ANSWER}}]})
+
+        async def gen():
+            await asyncio.sleep(first_token_ms / 1000.0)
+            for i, tok in enumerate(tokens):
+                chunk = {"created": int(time.time()), "choices": [{"index": 0, "delta": {"content": tok if i == 0 else " " + tok}}]}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(token_ms / 1000.0)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=9000)
+    ap.add_argument("--first-token-ms", type=float, default=300.0)
+    ap.add_argument("--token-ms", type=float, default=40.0)
+    args = ap.parse_args()
+    uvicorn.run(create_app(args.first_token_ms, args.token_ms), host="0.0.0.0", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
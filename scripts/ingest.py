@@ -1,13 +1,43 @@
+import argparse
 import asyncio
 from api.app.deps import deps
+from api.rag.indexer import chunk_pool
+from api.rag.jobs import IngestWorker
 from api.schemas.ingest import IngestRequest
+from api.settings import settings
 
 
 async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs-path", default="data/docs")
+    ap.add_argument("--recreate", action="store_true")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
     p = deps.pipeline()
-    r = await p.ingest(IngestRequest(docs_path="data/docs", recreate=True))
-    print(r.model_dump())
+    pool = None
+    if args.workers is not None:
+        pool = chunk_pool(args.workers)
+        p.indexer.workers = args.workers
+        p.indexer.pool = pool
+    jobs = deps.jobs()
+    worker = IngestWorker(
+        pipeline_factory=lambda: p,
+        jobs=jobs,
+        metrics=deps.metrics(),
+        lock_timeout_seconds=settings.ingest_lock_timeout_seconds,
+    )
+    try:
+        req = IngestRequest(docs_path=args.docs_path, recreate=args.recreate)
+        job = await jobs.create(req, collection=deps.vector_store().collection, enqueue=False)
+        job = await worker.run_job(job)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        await deps.shutdown()
+    if job.status != "done":
+        raise SystemExit(f"ingest {job.job_id} {job.status}: {'; '.join(job.errors)}")
+    print(job.result.model_dump())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,26 @@
+import asyncio
+import logging
+
+from api.settings import settings
+from api.app.deps import deps
+from api.app.logging import configure_logging
+from api.rag.jobs import IngestWorker
+
+
+async def main():
+    worker = IngestWorker(
+        pipeline_factory=deps.pipeline,
+        jobs=deps.jobs(),
+        metrics=deps.metrics(),
+        lock_timeout_seconds=settings.ingest_lock_timeout_seconds,
+    )
+    logging.getLogger("api").info("ingest_worker_started")
+    try:
+        await worker.run_forever()
+    finally:
+        await deps.shutdown()
+
+
+if __name__ == "__main__":
+    configure_logging(settings.log_level)
+    asyncio.run(main())
@@ -1,22 +1,76 @@
+import argparse
 import asyncio
 import time
 import httpx
 import numpy as np
 
 
-async def run(n: int = 40):
-    url = "http://localhost:8000/api/chat"
+async def run(n: int = 40, concurrency: int = 1, url: str = "http://localhost:8000/api/chat"):
     lat = []
-    async with httpx.AsyncClient(timeout=30) as client:
-        for i in range(n):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(client: httpx.AsyncClient, i: int):
+        async with sem:
             t0 = time.perf_counter()
-            r = await client.post(url, json={"conversation_id": "load", "message": "Какие условия поставки и сроки?"})
+            r = await client.post(url, json={"conversation_id": f"load-{i % concurrency}", "message": "Какие условия поставки и сроки?"})
             r.raise_for_status()
             lat.append((time.perf_counter() - t0) * 1000.0)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+        w0 = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(n)))
+        wall = time.perf_counter() - w0
     xs = np.array(lat)
-    out = {"n": int(xs.size), "p50_ms": float(np.percentile(xs, 50)), "p95_ms": float(np.percentile(xs, 95))}
-    print(out)
+    return {
+        "n": int(xs.size),
+        "concurrency": concurrency,
+        "rps": float(xs.size / wall),
+        "p50_ms": float(np.percentile(xs, 50)),
+        "p95_ms": float(np.percentile(xs, 95)),
+    }
+
+
+async def run_stream(n: int = 20, url: str = "http://localhost:8000/api/chat/stream"):
+    ttft, total = [], []
+    async with httpx.AsyncClient(timeout=30) as client:
+        for i in range(n):
+            t0 = time.perf_counter()
+            first = None
+            async with client.stream("POST", url, json={"conversation_id": "load-stream", "message": "Какие условия поставки и сроки?"}) as r:
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    if first is None and line.startswith("event: token"):
+                        first = (time.perf_counter() - t0) * 1000.0
+            total.append((time.perf_counter() - t0) * 1000.0)
+            ttft.append(first if first is not None else total[-1])
+    a, b = np.array(ttft), np.array(total)
+    return {
+        "n": int(a.size),
+        "ttft_p50_ms": float(np.percentile(a, 50)),
+        "ttft_p95_ms": float(np.percentile(a, 95)),
+        "total_p50_ms": float(np.percentile(b, 50)),
+        "total_p95_ms": float(np.percentile(b, 95)),
+    }
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=40)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    ap.add_argument("--url", default="http://localhost:8000/api/chat")
+    ap.add_argument("--stream", action="store_true")
+    args = ap.parse_args()
+    if args.stream:
+        print(await run_stream(args.n, args.url.rstrip("/") + "/stream"))
+        return
+    base = None
+    for c in args.concurrency:
+        out = await run(args.n, c, args.url)
+        base = base or out["rps"]
+        out["scaling"] = float(out["rps"] / base) if base else 0.0
+        print(out)
 
 
 if __name__ == "__main__":
-    asyncio.run(run())
\ No newline at end of file
+    asyncio.run(main())
@@ -1,28 +1,71 @@
-from api.intent.train import train
-from sklearn.metrics import classification_report
-import json
+import argparse
+import time
 from pathlib import Path
 
+import numpy as np
+from sklearn.metrics import accuracy_score, classification_report
 
-def load_jsonl(path: str):
-    xs, ys = [], []
-    for line in Path(path).read_text(encoding="utf-8").splitlines():
-        if not line.strip():
-            continue
-        obj = json.loads(line)
-        xs.append(obj["text"])
-        ys.append(obj["label"])
-    return xs, ys
+from api.intent.train import load_jsonl, train, train_embedding
+from api.settings import settings
+
+
+def latency(fn, xs, runs: int):
+    lat = []
+    for _ in range(runs):
+        for x in xs:
+            t0 = time.perf_counter()
+            fn(x)
+            lat.append(time.perf_counter() - t0)
+    lat = np.array(lat) * 1000.0
+    return {"p50_ms": round(float(np.percentile(lat, 50)), 3), "p99_ms": round(float(np.percentile(lat, 99)), 3)}
+
+
+def report(name, y_val, y_pred, lat):
+    print(f"== {name}: accuracy={accuracy_score(y_val, y_pred):.4f} {lat}")
+    print(classification_report(y_val, y_pred, digits=4, zero_division=0))
 
 
 def main():
-    model = train("data/intents/train.jsonl")
-    x_val, y_val = load_jsonl("data/intents/val.jsonl")
-    y_pred = model.predict(x_val)
-    print(classification_report(y_val, y_pred, digits=4))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--train", default="data/intents/train.jsonl")
+    ap.add_argument("--val", default="data/intents/val.jsonl")
+    ap.add_argument("--model", choices=["tfidf", "embedding", "both"], default="tfidf")
+    ap.add_argument("--head", choices=["centroid", "linear"], default="centroid")
+    ap.add_argument("--embedding-model", default=settings.embedding_model)
+    ap.add_argument("--runs", type=int, default=20)
+    args = ap.parse_args()
+
+    x_val, y_val = load_jsonl(args.val)
     Path("reports").mkdir(parents=True, exist_ok=True)
-    model.save("reports/intent_model.joblib")
+
+    if args.model in ("tfidf", "both"):
+        model = train(args.train)
+        report("tfidf", y_val, model.predict(x_val), latency(lambda x: model.predict([x]), x_val, args.runs))
+        model.save("reports/intent_model.joblib")
+
+    if args.model in ("embedding", "both"):
+        from api.rag.embeddings import EmbeddingClient
+
+        client = EmbeddingClient(
+            settings.embedding_provider,
+            args.embedding_model,
+            onnx_path=settings.embedding_onnx_path,
+            max_length=settings.embedding_max_length,
+        )
+        model = train_embedding(args.train, client.embed, args.embedding_model, head=args.head)
+        vectors = client.embed(x_val)
+        report(
+            f"embedding/{args.head}",
+            y_val,
+            model.predict_vectors(vectors),
+            {
+                "embed+head": latency(lambda x: model.predict_vectors(client.embed([x])), x_val, args.runs),
+                "head_only": latency(lambda v: model.predict_vectors([v]), vectors, args.runs),
+            },
+        )
+        model.save("reports/intent_embed.npz")
+        client.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()